@@ -0,0 +1,26 @@
+"""add vault session state
+
+Revision ID: 0011_add_vault_session_state
+Revises: 0010_add_auth_and_vault
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0011_add_vault_session_state"
+down_revision = "0010_add_auth_and_vault"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("moodle_vaults", sa.Column("session_state_ciphertext", sa.LargeBinary(), nullable=True))
+    op.add_column("moodle_vaults", sa.Column("session_state_nonce", sa.LargeBinary(), nullable=True))
+    op.add_column("moodle_vaults", sa.Column("session_saved_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("moodle_vaults", "session_saved_at")
+    op.drop_column("moodle_vaults", "session_state_nonce")
+    op.drop_column("moodle_vaults", "session_state_ciphertext")
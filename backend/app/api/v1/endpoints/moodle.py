@@ -7,12 +7,25 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.crud import moodle as crud_moodle
 from app.db.session import get_db
 from app.db.session import SessionLocal
 from app.modules.moodle.adapters import get_adapter
+from app.modules.moodle.browser_pool import browser_pool_metrics
 from app.modules.moodle.complete import complete_survey as complete_moodle_survey
 from app.modules.moodle import pipeline as moodle_pipeline
+from app.modules.moodle.crawl_plan import crawl_plan_metrics
+from app.modules.moodle.dates import date_parser_metrics
+from app.modules.moodle.detail_cache import detail_cache_metrics
+from app.modules.moodle.feedback_forms import feedback_form_metrics
+from app.modules.moodle.navigation import navigation_metrics
+from app.modules.moodle.page_cache import page_cache_metrics
+from app.modules.moodle.parse_pool import parse_pool_metrics
+from app.modules.moodle.rate_limit import rate_limit_metrics
+from app.modules.moodle.retry import retry_metrics
+from app.modules.moodle.survey_index import survey_index_metrics
+from app.modules.moodle.session_store import build_session_saver, load_session_state
 from app.schemas.moodle_course import MoodleCourseRead
 from app.schemas.moodle_module import MoodleModuleRead
 from app.schemas.moodle_module_survey import MoodleModuleSurveyRead
@@ -38,15 +51,18 @@ def _build_adapter_from_vault(db: Session, user_id: int):
     )
     creds_blob = decrypt_aes_gcm(pipeline_key, vault.credentials_nonce, vault.credentials_ciphertext)
     creds = jsonlib.loads(creds_blob.decode("utf-8"))
-    return get_adapter(creds)
+    return get_adapter(
+        creds,
+        storage_state=load_session_state(vault, pipeline_key),
+        session_saver=build_session_saver(db, user_id, pipeline_key),
+    )
 
 
 async def _refresh_course_surveys(db: Session, adapter, course) -> None:
+    course_surveys = await adapter.get_course_surveys(course.external_id)
     modules = await adapter.get_modules(course.external_id)
     if not modules:
         return
-    surveys = await adapter.get_surveys()
-    course_surveys = [survey for survey in surveys if survey.course_id == course.external_id]
     updated_modules = _merge_survey_flags(modules, course_surveys)
     course_map = {course.external_id: course}
     module_map = crud_moodle.upsert_modules(db, [module.__dict__ for module in updated_modules], course_map)
@@ -169,7 +185,7 @@ async def complete_survey(
         result = await complete_moodle_survey(survey.completion_url, adapter=adapter)
     finally:
         await adapter.close()
-    if result.get("submitted") or result.get("reason") in {"completion_badge", "completion_text", "already_completed"}:
+    if _survey_completed(result):
         crud_moodle.mark_survey_completed(db, survey)
     return {"detail": "Survey submission attempted", "result": result}
 
@@ -190,8 +206,22 @@ async def complete_course_surveys(
 
     adapter = _build_adapter_from_vault(db, current_user.id)
     await adapter.login()
+    slots = asyncio.Semaphore(max(1, settings.MOODLE_SURVEY_COMPLETION_CONCURRENCY))
+
+    async def attempt(completion_url: str) -> dict:
+        async with slots:
+            try:
+                return await complete_moodle_survey(completion_url, adapter=adapter)
+            except Exception as exc:
+                logging.getLogger("moodle").warning(
+                    "[Moodle] Survey completion failed for %s: %s", completion_url, exc
+                )
+                return {"submitted": False, "url": completion_url, "reason": "error"}
+
     try:
         await _refresh_course_surveys(db, adapter, course)
+        # Every pending survey in a round is independent, so submit them side by
+        # side; one course recheck per round then surfaces any newly unlocked ones.
         for _ in range(max_cycles):
             surveys = crud_moodle.list_module_surveys(
                 db, user_id=current_user.id, course_id=course_id, limit=1000
@@ -204,38 +234,38 @@ async def complete_course_surveys(
             if not pending:
                 break
 
+            attempts = await asyncio.gather(*(attempt(survey.completion_url) for survey in pending))
             progress_made = False
-            for survey in pending:
-                attempt = await complete_moodle_survey(survey.completion_url, adapter=adapter)
-                completed = attempt.get("submitted") or attempt.get("reason") in {
-                    "completion_badge",
-                    "completion_text",
-                    "already_completed",
-                }
-                if completed:
+            for survey, outcome in zip(pending, attempts):
+                if _survey_completed(outcome):
                     crud_moodle.mark_survey_completed(db, survey)
+                    progress_made = True
                 results.append(
                     {
                         "survey_id": survey.id,
                         "external_id": survey.external_id,
                         "completion_url": survey.completion_url,
-                        "result": attempt,
+                        "result": outcome,
                     }
                 )
                 attempted.add(survey.id)
 
-                if completed:
-                    await _refresh_course_surveys(db, adapter, course)
-                    progress_made = True
-                    break
-
             if not progress_made:
                 break
+            await _refresh_course_surveys(db, adapter, course)
         return {"detail": "Course surveys processed", "results": results}
     finally:
         await adapter.close()
 
 
+def _survey_completed(result: dict) -> bool:
+    return bool(result.get("submitted")) or result.get("reason") in {
+        "completion_badge",
+        "completion_text",
+        "already_completed",
+    }
+
+
 def _merge_survey_flags(modules, surveys):
     survey_map = {(survey.course_id, survey.module_id) for survey in surveys}
     updated = []
@@ -263,6 +293,23 @@ async def run_pipeline(kind: str = "full", current_user=Depends(get_current_user
     return {"run_id": run_id}
 
 
+@router.get("/pipeline/metrics")
+def pipeline_metrics(current_user=Depends(get_current_user)):
+    return {
+        "browser_pool": browser_pool_metrics(),
+        "retry": retry_metrics(),
+        "navigation": navigation_metrics(),
+        "rate_limit": rate_limit_metrics(),
+        "page_cache": page_cache_metrics(),
+        "parse_pool": parse_pool_metrics(),
+        "detail_cache": detail_cache_metrics(),
+        "survey_index": survey_index_metrics(),
+        "crawl_plan": crawl_plan_metrics(),
+        "date_parser": date_parser_metrics(),
+        "feedback_forms": feedback_form_metrics(),
+    }
+
+
 @router.get("/pipeline/stream/{run_id}")
 async def stream_pipeline(run_id: str, token: str | None = None):
     if not token:
@@ -339,6 +386,8 @@ async def _run_pipeline_by_kind(db: Session, kind: str, user_id: int) -> None:
         await moodle_pipeline.async_run_grades_pipeline(db, user_id)
     elif normalized == "quizzes":
         await moodle_pipeline.async_run_quizzes_pipeline(db, user_id)
+    elif normalized == "daily":
+        await moodle_pipeline.async_run_daily_pipeline(db, user_id)
     else:
         await moodle_pipeline.async_run_pipeline(db, user_id)
 
@@ -18,6 +18,49 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 14
     SERVER_MASTER_KEY: str = ""
+    MOODLE_ADAPTER: str = "auto"
+    MOODLE_WS_SERVICE: str = "moodle_mobile_app"
+    MOODLE_BROWSER_POOL_SIZE: int = 2
+    MOODLE_MAX_CONTEXTS_PER_BROWSER: int = 4
+    MOODLE_BROWSER_WARMUP: bool = False
+    MOODLE_BROWSER_MAX_NAVIGATIONS: int = 500
+    MOODLE_BROWSER_MAX_AGE_MINUTES: int = 60
+    MOODLE_BROWSER_MAX_RSS_MB: int = 1024
+    MOODLE_CONTEXT_MAX_NAVIGATIONS: int = 200
+    MOODLE_PAGE_CONCURRENCY: int = 4
+    MOODLE_PREFETCH_WINDOW: int = 3
+    MOODLE_GRADE_REPORT_CONCURRENCY: int = 3
+    MOODLE_GRADE_DETAIL_WORKERS: int = 4
+    MOODLE_SURVEY_COMPLETION_CONCURRENCY: int = 3
+    MOODLE_BLOCK_RESOURCES: bool = True
+    MOODLE_BLOCK_CSS: bool = False
+    MOODLE_BLOCK_SCRIPTS: bool = True
+    MOODLE_SCRIPT_ALLOWLIST: str = "/my/,/course/view.php,/mod/feedback/,/login/"
+    MOODLE_HTTP_FETCH: bool = True
+    MOODLE_HTTP_MAX_CONNECTIONS: int = 8
+    MOODLE_HTTP_SURVEY_SUBMIT: bool = True
+    MOODLE_ARCHIVE_MODE: str = "off"
+    MOODLE_ARCHIVE_DIR: str = ".cache/moodle_archives"
+    MOODLE_RETRY_ATTEMPTS: int = 3
+    MOODLE_RETRY_BASE_DELAY: float = 1.0
+    MOODLE_RETRY_MAX_DELAY: float = 15.0
+    MOODLE_BREAKER_FAILURE_THRESHOLD: int = 5
+    MOODLE_BREAKER_RESET_SECONDS: float = 60.0
+    MOODLE_RATE_LIMIT_RPS: float = 4.0
+    MOODLE_RATE_LIMIT_BURST: int = 8
+    MOODLE_PAGE_CACHE_ENABLED: bool = True
+    MOODLE_PAGE_CACHE_PATH: str = ".cache/moodle_pages.sqlite3"
+    MOODLE_PAGE_CACHE_MAX_ENTRIES: int = 5000
+    MOODLE_PAGE_CACHE_TTL_SECONDS: int = 86400
+    MOODLE_DETAIL_CACHE_ENABLED: bool = True
+    MOODLE_DETAIL_CACHE_PATH: str = ".cache/moodle_details.sqlite3"
+    MOODLE_DETAIL_CACHE_TTL_SECONDS: int = 604800
+    MOODLE_DETAIL_CACHE_DUE_WINDOW_HOURS: int = 48
+    MOODLE_SURVEY_INDEX_ENABLED: bool = True
+    MOODLE_SURVEY_INDEX_PATH: str = ".cache/moodle_survey_index.sqlite3"
+    MOODLE_SURVEY_INDEX_TTL_SECONDS: int = 21600
+    MOODLE_PARSE_WORKERS: int = 2
+    MOODLE_PARSE_EXECUTOR: str = "thread"
 
     class Config:
         env_file = ".env"
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
 
 from app.models.moodle_vault import MoodleVault
@@ -29,6 +31,9 @@ def upsert_vault(
         vault.pipeline_key_wrapped_server_nonce = pipeline_key_wrapped_server_nonce
         vault.user_kdf_salt = user_kdf_salt
         vault.cron_enabled = cron_enabled
+        vault.session_state_ciphertext = None
+        vault.session_state_nonce = None
+        vault.session_saved_at = None
     else:
         vault = MoodleVault(
             user_id=user_id,
@@ -62,5 +67,19 @@ def update_cron_status(
     return vault
 
 
+def update_session_state(
+    db: Session,
+    vault: MoodleVault,
+    session_state_ciphertext: bytes | None,
+    session_state_nonce: bytes | None,
+) -> MoodleVault:
+    vault.session_state_ciphertext = session_state_ciphertext
+    vault.session_state_nonce = session_state_nonce
+    vault.session_saved_at = datetime.now(timezone.utc) if session_state_ciphertext else None
+    db.commit()
+    db.refresh(vault)
+    return vault
+
+
 def list_cron_enabled_vaults(db: Session) -> list[MoodleVault]:
     return db.query(MoodleVault).filter(MoodleVault.cron_enabled.is_(True)).all()
@@ -1,3 +1,8 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
 import logging
 
 from fastapi import FastAPI, HTTPException, Request
@@ -6,23 +11,34 @@ from fastapi.responses import JSONResponse
 from starlette import status
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.modules.moodle.browser_pool import shutdown_browser_pool, warm_up_browser_pool
+from app.modules.moodle.parse_pool import shutdown_parse_pool
 from app.services.scheduler import start_scheduler, stop_scheduler
 
 app = FastAPI(title=settings.PROJECT_NAME)
+_background_tasks: set[asyncio.Task] = set()
 
 # Rutas bajo /api/v1 (cuando el tráfico pasa por el frontend nginx o el proxy no modifica el path)
 app.include_router(api_router, prefix="/api/v1")
 # Rutas bajo /v1 por si Traefik u otro proxy enruta /api/* al backend quitando el prefijo /api
 app.include_router(api_router, prefix="/v1")
+_IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
 
 @app.on_event("startup")
-def on_startup() -> None:
+async def on_startup() -> None:
     start_scheduler()
+    if settings.MOODLE_BROWSER_WARMUP:
+        task = asyncio.create_task(warm_up_browser_pool())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    logging.getLogger("api").info("[Startup] Application ready (imports took %.0f ms)", _IMPORT_MS)
 
 
 @app.on_event("shutdown")
-def on_shutdown() -> None:
+async def on_shutdown() -> None:
     stop_scheduler()
+    await shutdown_browser_pool()
+    shutdown_parse_pool()
 
 @app.get("/health")
 def health_check():
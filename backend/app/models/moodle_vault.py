@@ -17,5 +17,8 @@ class MoodleVault(Base):
     pipeline_key_wrapped_server_nonce = Column(LargeBinary, nullable=True)
     user_kdf_salt = Column(LargeBinary, nullable=False)
     cron_enabled = Column(Boolean, nullable=False, default=False)
+    session_state_ciphertext = Column(LargeBinary, nullable=True)
+    session_state_nonce = Column(LargeBinary, nullable=True)
+    session_saved_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
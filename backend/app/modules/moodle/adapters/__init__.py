@@ -1,10 +1,37 @@
 from __future__ import annotations
 
+import importlib
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from app.core.config import settings
 from app.modules.moodle.adapters.base import MoodleAdapter
-from app.modules.moodle.adapters.uip import UIPMoodleAdapter
 
+if TYPE_CHECKING:
+    from app.modules.moodle.adapters.auto import AutoMoodleAdapter
+    from app.modules.moodle.adapters.uip import UIPMoodleAdapter
+    from app.modules.moodle.adapters.ws import WebServiceMoodleAdapter
+
+# Concrete adapters pull in Playwright, httpx and the HTML parsers; load them on
+# first use so API processes that never touch Moodle start without them.
+_LAZY_EXPORTS = {
+    "AutoMoodleAdapter": "app.modules.moodle.adapters.auto",
+    "UIPMoodleAdapter": "app.modules.moodle.adapters.uip",
+    "WebServiceMoodleAdapter": "app.modules.moodle.adapters.ws",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
 
-def get_adapter(user) -> MoodleAdapter:
+
+def get_adapter(
+    user,
+    storage_state: Optional[dict] = None,
+    session_saver: Optional[Callable[[Optional[dict]], None]] = None,
+) -> MoodleAdapter:
     username = ""
     password = ""
     base_url = None
@@ -18,7 +45,36 @@ def get_adapter(user) -> MoodleAdapter:
         password = getattr(user, "password", "") or ""
         base_url = getattr(user, "base_url", None)
 
-    return UIPMoodleAdapter(username=username, password=password, base_url=base_url)
+    mode = settings.MOODLE_ADAPTER.strip().lower()
+    if mode == "ws":
+        from app.modules.moodle.adapters.ws import WebServiceMoodleAdapter
+
+        return WebServiceMoodleAdapter(username=username, password=password, base_url=base_url)
+    if mode == "auto":
+        from app.modules.moodle.adapters.auto import build_auto_adapter
+
+        return build_auto_adapter(
+            username=username,
+            password=password,
+            base_url=base_url,
+            storage_state=storage_state,
+            session_saver=session_saver,
+        )
+    from app.modules.moodle.adapters.uip import UIPMoodleAdapter
+
+    return UIPMoodleAdapter(
+        username=username,
+        password=password,
+        base_url=base_url,
+        storage_state=storage_state,
+        session_saver=session_saver,
+    )
 
 
-__all__ = ["MoodleAdapter", "UIPMoodleAdapter", "get_adapter"]
+__all__ = [
+    "AutoMoodleAdapter",
+    "MoodleAdapter",
+    "UIPMoodleAdapter",
+    "WebServiceMoodleAdapter",
+    "get_adapter",
+]
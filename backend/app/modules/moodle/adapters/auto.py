@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.modules.moodle.adapters.base import MoodleAdapter
+from app.modules.moodle.adapters.uip import UIPMoodleAdapter
+from app.modules.moodle.adapters.ws import WebServiceMoodleAdapter, WebServiceUnavailableError
+from app.modules.moodle.models import (
+    MoodleCourse,
+    MoodleGradeItem,
+    MoodleModule,
+    MoodleModuleSurvey,
+)
+
+_WS_UNAVAILABLE_TTL_SECONDS = 3600
+_ws_unavailable_hosts: dict[str, float] = {}
+
+
+class AutoMoodleAdapter(MoodleAdapter):
+    def __init__(
+        self,
+        ws_adapter: WebServiceMoodleAdapter,
+        uip_factory: Callable[[], UIPMoodleAdapter],
+        base_url: str,
+    ):
+        self._ws = ws_adapter
+        self._uip_factory = uip_factory
+        self._uip: UIPMoodleAdapter | None = None
+        self._host = urlparse(base_url).hostname or base_url
+        self._active: MoodleAdapter | None = None
+        self._switch_lock = asyncio.Lock()
+        self._logger = logging.getLogger("moodle")
+
+    async def login(self) -> None:
+        if self._active is None:
+            async with self._switch_lock:
+                if self._active is None:
+                    await self._pick_adapter()
+        await self._active.login()
+
+    async def _pick_adapter(self) -> None:
+        if not _ws_known_unavailable(self._host):
+            try:
+                await self._ws.login()
+                self._active = self._ws
+                return
+            except WebServiceUnavailableError as exc:
+                self._mark_unavailable(exc)
+        await self._use_uip()
+
+    async def close(self) -> None:
+        await self._ws.close()
+        if self._uip:
+            await self._uip.close()
+        self._active = None
+
+    async def get_courses(self) -> list[MoodleCourse]:
+        return await self._run("get_courses")
+
+    async def get_modules(self, course_id: str) -> list[MoodleModule]:
+        return await self._run("get_modules", course_id)
+
+    async def get_grades(self) -> list[MoodleGradeItem]:
+        return await self._run("get_grades")
+
+    async def get_quizzes(self) -> list[MoodleGradeItem]:
+        return await self._run("get_quizzes")
+
+    async def get_surveys(self) -> list[MoodleModuleSurvey]:
+        return await self._run("get_surveys")
+
+    async def get_course_surveys(self, course_id: str) -> list[MoodleModuleSurvey]:
+        return await self._run("get_course_surveys", course_id)
+
+    async def complete_survey(self, completion_url: str) -> dict:
+        return await self._run("complete_survey", completion_url)
+
+    async def _run(self, method: str, *args: Any) -> Any:
+        await self.login()
+        if self._active is self._ws:
+            try:
+                return await getattr(self._ws, method)(*args)
+            except WebServiceUnavailableError as exc:
+                await self._fall_back_to_uip(exc)
+            except Exception:
+                # Calls running concurrently on one adapter: a sibling switched
+                # to UIP while this one was in flight, so retry it there.
+                if self._active is self._ws:
+                    raise
+        return await getattr(self._active, method)(*args)
+
+    async def _fall_back_to_uip(self, exc: Exception) -> None:
+        async with self._switch_lock:
+            if self._active is not self._ws:
+                return
+            self._mark_unavailable(exc)
+            # The web services session is closed with the adapter, not here:
+            # sibling calls may still be using it.
+            await self._use_uip()
+
+    async def _use_uip(self) -> None:
+        if self._uip is None:
+            self._uip = self._uip_factory()
+        await self._uip.login()
+        self._active = self._uip
+
+    def _mark_unavailable(self, exc: Exception) -> None:
+        _ws_unavailable_hosts[self._host] = time.monotonic()
+        self._logger.info("[Moodle] Web services unavailable, falling back to UIP: %s", exc)
+
+
+def _ws_known_unavailable(host: str) -> bool:
+    marked_at = _ws_unavailable_hosts.get(host)
+    if marked_at is None:
+        return False
+    if time.monotonic() - marked_at > _WS_UNAVAILABLE_TTL_SECONDS:
+        _ws_unavailable_hosts.pop(host, None)
+        return False
+    return True
+
+
+def build_auto_adapter(
+    username: str,
+    password: str,
+    base_url: Optional[str] = None,
+    storage_state: Optional[dict] = None,
+    session_saver: Optional[Callable[[Optional[dict]], None]] = None,
+) -> AutoMoodleAdapter:
+    resolved_base_url = base_url or settings.MOODLE_BASE_URL
+    return AutoMoodleAdapter(
+        WebServiceMoodleAdapter(username=username, password=password, base_url=resolved_base_url),
+        lambda: UIPMoodleAdapter(
+            username=username,
+            password=password,
+            base_url=resolved_base_url,
+            storage_state=storage_state,
+            session_saver=session_saver,
+        ),
+        resolved_base_url,
+    )
@@ -39,6 +39,10 @@ class MoodleAdapter(ABC):
     async def get_surveys(self) -> list[MoodleModuleSurvey]:
         raise NotImplementedError
 
+    @abstractmethod
+    async def get_course_surveys(self, course_id: str) -> list[MoodleModuleSurvey]:
+        raise NotImplementedError
+
     @abstractmethod
     async def complete_survey(self, completion_url: str) -> dict:
         raise NotImplementedError
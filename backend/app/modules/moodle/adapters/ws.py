@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.modules.moodle.adapters.base import MoodleAdapter
+from app.modules.moodle.models import (
+    MoodleCourse,
+    MoodleGradeItem,
+    MoodleModule,
+    MoodleModuleSurvey,
+)
+from app.modules.moodle.rate_limit import throttle
+from app.modules.moodle.retry import call_with_retry
+from app.modules.moodle.labels import matches_survey_name
+from app.modules.moodle.text import parse_grade_value
+
+
+_UNAVAILABLE_ERRORCODES = {
+    "enablewsdescription",
+    "servicenotavailable",
+    "webservicesnotenabled",
+    "accessexception",
+    "nopermissions",
+    "invalidtoken",
+}
+_SUBMISSION_STATUS_LABELS = {
+    "new": "No entregado",
+    "draft": "Borrador (no enviado)",
+    "submitted": "Enviado para calificar",
+    "reopened": "Reabierto",
+}
+_GRADING_STATUS_LABELS = {
+    "graded": "Calificado",
+    "notgraded": "Sin calificar",
+}
+_FEEDBACK_TEXT_ANSWER = "Sin comentarios."
+
+
+class WebServiceUnavailableError(RuntimeError):
+    pass
+
+
+class MoodleWebServiceError(RuntimeError):
+    def __init__(self, errorcode: str, message: str) -> None:
+        super().__init__(f"{errorcode}: {message}")
+        self.errorcode = errorcode
+
+
+class WebServiceMoodleAdapter(MoodleAdapter):
+    def __init__(self, username: str, password: str, base_url: Optional[str] = None):
+        self._base_url = (base_url or settings.MOODLE_BASE_URL).rstrip("/")
+        self._username = username
+        self._password = password
+        self._logger = logging.getLogger("moodle")
+        self._http: httpx.AsyncClient | None = None
+        self._token: str | None = None
+        self._user_id: int | None = None
+        self._courses_cache: list[MoodleCourse] | None = None
+        self._contents_cache: dict[str, list[dict]] = {}
+
+    async def login(self) -> None:
+        if self._token:
+            return
+        if not self._base_url or not self._username or not self._password:
+            raise ValueError("Missing Moodle credentials or base URL.")
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(30.0))
+        url = f"{self._base_url}/login/token.php"
+        data = {
+            "username": self._username,
+            "password": self._password,
+            "service": settings.MOODLE_WS_SERVICE,
+        }
+        try:
+            response = await call_with_retry("ws_token", url, lambda: self._post(url, data))
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            raise WebServiceUnavailableError(f"Token endpoint not available: {exc}") from exc
+        token = payload.get("token") if isinstance(payload, dict) else None
+        if not token:
+            errorcode = payload.get("errorcode", "") if isinstance(payload, dict) else ""
+            if errorcode == "invalidlogin":
+                raise RuntimeError("Login failed: invalid Moodle credentials.")
+            raise WebServiceUnavailableError(f"Token request rejected: {errorcode or payload}")
+        self._token = token
+        site_info = await self._call("core_webservice_get_site_info")
+        self._user_id = int(site_info["userid"])
+        self._logger.info("[Moodle] Login OK (web services)")
+
+    async def close(self) -> None:
+        if self._http:
+            await self._http.aclose()
+        self._http = None
+        self._token = None
+        self._user_id = None
+        self._courses_cache = None
+        self._contents_cache = {}
+
+    async def get_courses(self) -> list[MoodleCourse]:
+        await self.login()
+        if self._courses_cache is None:
+            rows = await self._call("core_enrol_get_users_courses", userid=self._user_id)
+            self._courses_cache = [
+                MoodleCourse(id=str(row["id"]), name=row.get("fullname") or f"Course {row['id']}")
+                for row in rows
+            ]
+        return list(self._courses_cache)
+
+    async def get_modules(self, course_id: str) -> list[MoodleModule]:
+        sections = await self._course_contents(course_id)
+        modules: list[MoodleModule] = []
+        for idx, section in enumerate(sections):
+            if not section.get("section"):
+                continue
+            locked = not section.get("uservisible", True)
+            has_survey = any(_is_survey_module(module) for module in section.get("modules", []))
+            modules.append(
+                MoodleModule(
+                    id=str(section["id"]),
+                    course_id=course_id,
+                    title=section.get("name") or f"Module {idx + 1}",
+                    visible=not locked,
+                    blocked=locked,
+                    block_reason="locked" if locked else None,
+                    has_survey=has_survey,
+                    url=f"{self._base_url}/course/section.php?id={section['id']}",
+                )
+            )
+        return modules
+
+    async def get_grades(self) -> list[MoodleGradeItem]:
+        return await self._fetch_grade_items()
+
+    async def get_quizzes(self) -> list[MoodleGradeItem]:
+        return await self._fetch_grade_items(item_type_filter={"quiz"})
+
+    async def get_surveys(self) -> list[MoodleModuleSurvey]:
+        courses = await self.get_courses()
+        course_sections = await asyncio.gather(*(self._course_contents(course.id) for course in courses))
+        surveys: list[MoodleModuleSurvey] = []
+        for course, sections in zip(courses, course_sections):
+            surveys.extend(self._surveys_from_sections(course.id, sections))
+        return surveys
+
+    async def get_course_surveys(self, course_id: str) -> list[MoodleModuleSurvey]:
+        self._contents_cache.pop(course_id, None)
+        return self._surveys_from_sections(course_id, await self._course_contents(course_id))
+
+    def _surveys_from_sections(self, course_id: str, sections: list[dict]) -> list[MoodleModuleSurvey]:
+        surveys: list[MoodleModuleSurvey] = []
+        for section in sections:
+            if not section.get("section"):
+                continue
+            for module in section.get("modules", []):
+                if not _is_survey_module(module):
+                    continue
+                cmid = str(module["id"])
+                surveys.append(
+                    MoodleModuleSurvey(
+                        id=cmid,
+                        module_id=str(section["id"]),
+                        course_id=course_id,
+                        title=module.get("name") or "Enviar encuesta",
+                        url=module.get("url"),
+                        completion_url=(
+                            f"{self._base_url}/mod/feedback/complete.php"
+                            f"?id={cmid}&courseid={course_id}"
+                        ),
+                    )
+                )
+        return surveys
+
+    async def complete_survey(self, completion_url: str) -> dict:
+        await self.login()
+        params = parse_qs(urlparse(completion_url).query)
+        cmid = (params.get("id") or [""])[0]
+        course_id = (params.get("courseid") or [""])[0]
+        if not cmid.isdigit() or not course_id.isdigit():
+            return {"submitted": False, "url": completion_url, "reason": "form_not_found"}
+
+        result = await self._call("mod_feedback_get_feedbacks_by_courses", courseids=[int(course_id)])
+        feedback = next(
+            (row for row in result.get("feedbacks", []) if str(row.get("coursemodule")) == cmid),
+            None,
+        )
+        if feedback is None:
+            return {"submitted": False, "url": completion_url, "reason": "form_not_found"}
+        feedback_id = feedback["id"]
+
+        access = await self._call("mod_feedback_get_feedback_access_information", feedbackid=feedback_id)
+        if access.get("isalreadysubmitted"):
+            return {"submitted": True, "url": completion_url, "reason": "already_completed"}
+        if not access.get("cancomplete", True):
+            return {"submitted": False, "url": completion_url, "reason": "completion_not_allowed"}
+
+        items = (await self._call("mod_feedback_get_items", feedbackid=feedback_id)).get("items", [])
+        pages = _split_feedback_pages(items)
+        await self._call("mod_feedback_launch_feedback", feedbackid=feedback_id)
+        page = 0
+        for _ in range(len(pages) + 1):
+            page_items = pages[page] if page < len(pages) else []
+            responses = [
+                response for response in map(_feedback_response, page_items) if response is not None
+            ]
+            processed = await self._call(
+                "mod_feedback_process_page",
+                feedbackid=feedback_id,
+                page=page,
+                responses=responses,
+                goprevious=0,
+            )
+            if processed.get("completed"):
+                result = {"submitted": True, "url": completion_url, "reason": "completion_text"}
+                self._logger.info("[Moodle] Survey completion result: %s", result)
+                return result
+            next_page = processed.get("jumpto")
+            if next_page is None or next_page == page:
+                break
+            page = next_page
+        return {"submitted": False, "url": completion_url, "reason": "submit_unknown"}
+
+    async def _fetch_grade_items(self, item_type_filter: set[str] | None = None) -> list[MoodleGradeItem]:
+        courses = await self.get_courses()
+        course_ids = [int(course.id) for course in courses]
+        if not course_ids:
+            return []
+        assignments, quizzes = await asyncio.gather(
+            self._call("mod_assign_get_assignments", courseids=course_ids),
+            self._call("mod_quiz_get_quizzes_by_courses", courseids=course_ids),
+        )
+        assign_by_cmid = {
+            str(assignment["cmid"]): assignment
+            for course in assignments.get("courses", [])
+            for assignment in course.get("assignments", [])
+        }
+        quiz_by_cmid = {str(quiz["coursemodule"]): quiz for quiz in quizzes.get("quizzes", [])}
+
+        course_items = await asyncio.gather(
+            *(self._course_grade_items(course.id, item_type_filter) for course in courses)
+        )
+        items: list[MoodleGradeItem] = []
+        for entries in course_items:
+            details = await asyncio.gather(
+                *(self._activity_details(entry, assign_by_cmid, quiz_by_cmid) for entry in entries)
+            )
+            for entry, detail in zip(entries, details):
+                items.append(MoodleGradeItem(**entry, **detail))
+        return items
+
+    async def _course_grade_items(self, course_id: str, item_type_filter: set[str] | None) -> list[dict]:
+        try:
+            report = await self._call(
+                "gradereport_user_get_grade_items", courseid=int(course_id), userid=self._user_id
+            )
+        except MoodleWebServiceError as exc:
+            self._logger.warning("[Moodle] Grade report load failed for course %s: %s", course_id, exc)
+            return []
+        entries: list[dict] = []
+        for usergrade in report.get("usergrades", []):
+            for idx, grade in enumerate(usergrade.get("gradeitems", [])):
+                item_type = {"assign": "assignment", "quiz": "quiz"}.get(grade.get("itemmodule") or "")
+                if not item_type or (item_type_filter and item_type not in item_type_filter):
+                    continue
+                cmid = grade.get("cmid")
+                grade_display = grade.get("gradeformatted") or ""
+                grade_value = parse_grade_value(grade_display)
+                entries.append(
+                    {
+                        "id": str(cmid) if cmid else f"{course_id}-item-{idx + 1}",
+                        "course_id": course_id,
+                        "title": grade.get("itemname") or f"Actividad {idx + 1}",
+                        "item_type": item_type,
+                        "grade_value": grade_value,
+                        "grade_display": grade_display if grade_value is not None else None,
+                        "url": (
+                            f"{self._base_url}/mod/{grade['itemmodule']}/view.php?id={cmid}" if cmid else None
+                        ),
+                    }
+                )
+        return entries
+
+    async def _activity_details(
+        self, entry: dict, assign_by_cmid: dict[str, dict], quiz_by_cmid: dict[str, dict]
+    ) -> dict[str, Any]:
+        details: dict[str, Any] = {
+            "available_at": None,
+            "due_at": None,
+            "submission_status": None,
+            "grading_status": None,
+            "last_submission_at": None,
+            "attempts_allowed": None,
+            "time_limit_minutes": None,
+        }
+        if entry["item_type"] == "assignment" and entry["id"] in assign_by_cmid:
+            assignment = assign_by_cmid[entry["id"]]
+            details["available_at"] = _format_timestamp(assignment.get("allowsubmissionsfromdate"))
+            details["due_at"] = _format_timestamp(assignment.get("duedate"))
+            try:
+                status = await self._call("mod_assign_get_submission_status", assignid=assignment["id"])
+            except MoodleWebServiceError as exc:
+                self._logger.warning("[Moodle] Assignment detail parse failed: %s", exc)
+                return details
+            attempt = status.get("lastattempt") or {}
+            submission = attempt.get("submission") or {}
+            if submission.get("status"):
+                details["submission_status"] = _SUBMISSION_STATUS_LABELS.get(
+                    submission["status"], submission["status"]
+                )
+            if attempt.get("gradingstatus"):
+                details["grading_status"] = _GRADING_STATUS_LABELS.get(
+                    attempt["gradingstatus"], attempt["gradingstatus"]
+                )
+            details["last_submission_at"] = _format_timestamp(submission.get("timemodified"))
+        elif entry["item_type"] == "quiz" and entry["id"] in quiz_by_cmid:
+            quiz = quiz_by_cmid[entry["id"]]
+            details["available_at"] = _format_timestamp(quiz.get("timeopen"))
+            details["due_at"] = _format_timestamp(quiz.get("timeclose"))
+            details["attempts_allowed"] = quiz.get("attempts") or None
+            if quiz.get("timelimit"):
+                details["time_limit_minutes"] = int(quiz["timelimit"]) // 60
+        return details
+
+    async def _course_contents(self, course_id: str) -> list[dict]:
+        await self.login()
+        if course_id not in self._contents_cache:
+            self._contents_cache[course_id] = await self._call(
+                "core_course_get_contents", courseid=int(course_id)
+            )
+        return self._contents_cache[course_id]
+
+    async def _call(self, function: str, **params: Any) -> Any:
+        if self._http is None or self._token is None:
+            raise RuntimeError("Adapter not logged in. Call login() first.")
+        data = {
+            "wstoken": self._token,
+            "wsfunction": function,
+            "moodlewsrestformat": "json",
+            **_flatten_params(params),
+        }
+        url = f"{self._base_url}/webservice/rest/server.php"
+        response = await call_with_retry("ws_call", url, lambda: self._post(url, data))
+        payload = response.json()
+        if isinstance(payload, dict) and payload.get("exception"):
+            errorcode = payload.get("errorcode") or ""
+            message = payload.get("message") or ""
+            if errorcode in _UNAVAILABLE_ERRORCODES:
+                raise WebServiceUnavailableError(f"{function} not available: {errorcode}")
+            raise MoodleWebServiceError(errorcode, message)
+        return payload
+
+    async def _post(self, url: str, data: dict[str, Any]) -> httpx.Response:
+        await throttle(url)
+        response = await self._http.post(url, data=data)
+        response.raise_for_status()
+        return response
+
+
+def _flatten_params(params: dict[str, Any], prefix: str = "") -> dict[str, str]:
+    flat: dict[str, str] = {}
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(_flatten_params(value, name))
+        elif isinstance(value, (list, tuple)):
+            flat.update(_flatten_params({str(idx): entry for idx, entry in enumerate(value)}, name))
+        elif isinstance(value, bool):
+            flat[name] = "1" if value else "0"
+        elif value is not None:
+            flat[name] = str(value)
+    return flat
+
+
+def _is_survey_module(module: dict) -> bool:
+    if module.get("modname") not in {"feedback", "survey"}:
+        return False
+    if not module.get("uservisible", True):
+        return False
+    return matches_survey_name(module.get("name") or "")
+
+
+def _format_timestamp(value: Any) -> str | None:
+    if not value:
+        return None
+    return datetime.fromtimestamp(int(value), tz=timezone.utc).isoformat()
+
+
+def _split_feedback_pages(items: list[dict]) -> list[list[dict]]:
+    pages: list[list[dict]] = [[]]
+    for item in items:
+        if item.get("typ") == "pagebreak":
+            pages.append([])
+            continue
+        pages[-1].append(item)
+    return pages
+
+
+def _feedback_response(item: dict) -> dict | None:
+    item_type = item.get("typ")
+    name = f"{item_type}_{item.get('id')}"
+    if item_type in {"multichoice", "multichoicerated"}:
+        return {"name": name, "value": "1"}
+    if item_type in {"textarea", "textfield"}:
+        return {"name": name, "value": _FEEDBACK_TEXT_ANSWER}
+    if item_type == "numeric":
+        lower = (item.get("presentation") or "").split("|", 1)[0].strip()
+        return {"name": name, "value": lower or "0"}
+    return None
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Archives hold authenticated pages (sesskeys included) in plaintext, so
+# cookies and the login form body are never written to disk.
+_KEPT_HEADERS = ("content-type", "location", "etag", "last-modified")
+_COOKIE_HEADERS = {"cookie", "set-cookie"}
+_LOGIN_PATH = "/login/index.php"
+
+
+class ArchiveMissError(RuntimeError):
+    pass
+
+
+class MoodleArchive:
+    def __init__(self, mode: str, directory: Path) -> None:
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown archive mode: {mode}")
+        self.mode = mode
+        self.directory = directory
+        self._entries: dict[str, list[dict]] = {}
+        self._served: dict[str, int] = {}
+        self._logger = logging.getLogger("moodle")
+        if self.replaying:
+            self._load()
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls, base_url: str, username: str) -> Optional["MoodleArchive"]:
+        mode = settings.MOODLE_ARCHIVE_MODE.strip().lower()
+        if mode in ("", "off"):
+            return None
+        owner = hashlib.sha256(f"{base_url}|{username}".encode("utf-8")).hexdigest()[:16]
+        return cls(mode, Path(settings.MOODLE_ARCHIVE_DIR) / owner)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    @property
+    def har_path(self) -> Path:
+        return self.directory / "browser.har"
+
+    @property
+    def http_path(self) -> Path:
+        return self.directory / "http.json"
+
+    async def attach(self, context: BrowserContext) -> None:
+        if self.replaying and not self.har_path.exists():
+            raise FileNotFoundError(f"No recorded browser archive at {self.har_path}")
+        await context.route_from_har(
+            self.har_path,
+            not_found="abort" if self.replaying else "fallback",
+            update=self.recording,
+            update_content="embed",
+        )
+
+    def http_transport(self) -> httpx.AsyncBaseTransport:
+        if self.replaying:
+            return _ReplayTransport(self)
+        return _RecordingTransport(
+            self,
+            httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.MOODLE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.MOODLE_HTTP_MAX_CONNECTIONS,
+                )
+            ),
+        )
+
+    def record(self, request: httpx.Request, status: int, headers: httpx.Headers, body: bytes) -> None:
+        self._entries.setdefault(_entry_key(request.method, str(request.url)), []).append(
+            {
+                "status": status,
+                "headers": [[name, value] for name, value in headers.multi_items() if name in _KEPT_HEADERS],
+                "body": base64.b64encode(body).decode("ascii"),
+            }
+        )
+
+    def replay(self, request: httpx.Request) -> httpx.Response:
+        key = _entry_key(request.method, str(request.url))
+        entries = self._entries.get(key)
+        if not entries:
+            raise ArchiveMissError(f"No recorded response for {key}")
+        index = self._served.get(key, 0)
+        self._served[key] = index + 1
+        entry = entries[min(index, len(entries) - 1)]
+        return httpx.Response(
+            entry["status"],
+            headers=[tuple(item) for item in entry["headers"]],
+            content=base64.b64decode(entry["body"]),
+            request=request,
+        )
+
+    def save(self) -> None:
+        if not self.recording:
+            return
+        self._scrub_har()
+        if not self._entries:
+            return
+        self.http_path.write_text(json.dumps(self._entries), encoding="utf-8")
+        self._logger.info(
+            "[Moodle] Recorded %s HTTP responses to %s",
+            sum(len(entries) for entries in self._entries.values()),
+            self.http_path,
+        )
+
+    def _scrub_har(self) -> None:
+        # Playwright writes the HAR when the context closes; replay matches a
+        # POST without recorded postData on url and method alone.
+        if not self.har_path.exists():
+            return
+        har = json.loads(self.har_path.read_text(encoding="utf-8"))
+        for entry in har.get("log", {}).get("entries", []):
+            request = entry.get("request", {})
+            if _LOGIN_PATH in request.get("url", ""):
+                request.pop("postData", None)
+            for message in (request, entry.get("response", {})):
+                message["headers"] = [
+                    header
+                    for header in message.get("headers", [])
+                    if header.get("name", "").lower() not in _COOKIE_HEADERS
+                ]
+                message["cookies"] = []
+        self.har_path.write_text(json.dumps(har), encoding="utf-8")
+
+    def _load(self) -> None:
+        if self.http_path.exists():
+            self._entries = json.loads(self.http_path.read_text(encoding="utf-8"))
+
+
+class _RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, archive: MoodleArchive, inner: httpx.AsyncBaseTransport) -> None:
+        self._archive = archive
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._inner.handle_async_request(request)
+        raw = httpx.Response(response.status_code, headers=response.headers, stream=response.stream)
+        body = await raw.aread()
+        self._archive.record(request, response.status_code, response.headers, body)
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, archive: MoodleArchive) -> None:
+        self._archive = archive
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return self._archive.replay(request)
+
+
+def _entry_key(method: str, url: str) -> str:
+    return f"{method.upper()} {url}"
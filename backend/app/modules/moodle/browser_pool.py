@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Playwright
+
+
+@dataclass
+class _PooledBrowser:
+    id: int
+    browser: Browser
+    launched_at: float = field(default_factory=time.monotonic)
+    contexts: set[BrowserContext] = field(default_factory=set)
+    contexts_served: int = 0
+    launch_seconds: float = 0.0
+    navigations: int = 0
+    rss_mb: Optional[float] = None
+    rss_checked_at: float = 0.0
+    retire_reason: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser.is_connected()
+
+    @property
+    def marker(self) -> str:
+        return _browser_marker(self.id)
+
+
+@dataclass(frozen=True)
+class ContextLease:
+    browser_id: int
+    context: BrowserContext
+
+
+class BrowserPool:
+    def __init__(self, size: int, max_contexts_per_browser: int) -> None:
+        self._size = max(1, size)
+        self._max_contexts = max(1, max_contexts_per_browser)
+        self._playwright: Optional[Playwright] = None
+        self._browsers: list[_PooledBrowser] = []
+        self._drained: list[_PooledBrowser] = []
+        self._ids = itertools.count(1)
+        self._condition = asyncio.Condition()
+        self._closed = False
+        self._logger = logging.getLogger("moodle")
+        self._launches = 0
+        self._health_failures = 0
+        self._acquired = 0
+        self._released = 0
+        self._wait_seconds = 0.0
+        self._first_acquire_seconds: Optional[float] = None
+        self._recycles: Counter[str] = Counter()
+        self._recycle_events: deque[dict[str, Any]] = deque(maxlen=20)
+
+    async def acquire_context(self, **context_options: Any) -> ContextLease:
+        started = time.monotonic()
+        try:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed.")
+                    self._drop_unhealthy()
+                    await self._check_retirement()
+                    pooled = self._pick_browser()
+                    if pooled is None and len(self._active_browsers()) < self._size:
+                        pooled = await self._launch()
+                    if pooled is not None:
+                        break
+                    await self._condition.wait()
+
+                context = await pooled.browser.new_context(**context_options)
+                pooled.contexts.add(context)
+                pooled.contexts_served += 1
+                elapsed = time.monotonic() - started
+                if self._first_acquire_seconds is None:
+                    self._first_acquire_seconds = elapsed
+                self._acquired += 1
+                self._wait_seconds += elapsed
+                return ContextLease(browser_id=pooled.id, context=context)
+        finally:
+            # Browsers retired while idle have no release to close them.
+            await self._close_drained()
+
+    async def release_context(self, lease: ContextLease) -> None:
+        try:
+            await lease.context.close()
+        except Exception as exc:
+            self._logger.debug("[Moodle] Context close failed: %s", exc)
+        async with self._condition:
+            pooled = self._find(lease.browser_id)
+            if pooled is not None:
+                pooled.contexts.discard(lease.context)
+                if pooled.retire_reason and not pooled.contexts:
+                    self._drain(pooled)
+            self._released += 1
+            self._condition.notify_all()
+        await self._close_drained()
+
+    def record_navigation(self, lease: ContextLease) -> None:
+        pooled = self._find(lease.browser_id)
+        if pooled is not None:
+            pooled.navigations += 1
+
+    def retire_reason(self, lease: ContextLease) -> Optional[str]:
+        pooled = self._find(lease.browser_id)
+        if pooled is None:
+            return "browser_removed"
+        return pooled.retire_reason
+
+    async def close(self) -> None:
+        async with self._condition:
+            self._closed = True
+            browsers = self._browsers + self._drained
+            self._browsers = []
+            self._drained = []
+            self._condition.notify_all()
+        for pooled in browsers:
+            try:
+                await pooled.browser.close()
+            except Exception as exc:
+                self._logger.debug("[Moodle] Browser close failed: %s", exc)
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "size": self._size,
+            "max_contexts_per_browser": self._max_contexts,
+            "launches": self._launches,
+            "health_failures": self._health_failures,
+            "contexts_acquired": self._acquired,
+            "contexts_released": self._released,
+            "contexts_active": sum(len(pooled.contexts) for pooled in self._browsers),
+            "acquire_wait_seconds": round(self._wait_seconds, 3),
+            "first_acquire_seconds": (
+                round(self._first_acquire_seconds, 3) if self._first_acquire_seconds is not None else None
+            ),
+            "recycles": dict(self._recycles),
+            "recycle_events": list(self._recycle_events),
+            "browsers": [
+                {
+                    "id": pooled.id,
+                    "healthy": pooled.healthy,
+                    "contexts_active": len(pooled.contexts),
+                    "contexts_served": pooled.contexts_served,
+                    "uptime_seconds": round(now - pooled.launched_at, 1),
+                    "launch_seconds": round(pooled.launch_seconds, 3),
+                    "navigations": pooled.navigations,
+                    "rss_mb": pooled.rss_mb,
+                    "retiring": pooled.retire_reason,
+                }
+                for pooled in self._browsers
+            ],
+        }
+
+    def _find(self, browser_id: int) -> _PooledBrowser | None:
+        for pooled in self._browsers:
+            if pooled.id == browser_id:
+                return pooled
+        return None
+
+    def _active_browsers(self) -> list[_PooledBrowser]:
+        return [pooled for pooled in self._browsers if not pooled.retire_reason]
+
+    def _pick_browser(self) -> _PooledBrowser | None:
+        candidates = [
+            pooled for pooled in self._active_browsers() if len(pooled.contexts) < self._max_contexts
+        ]
+        if not candidates:
+            return None
+        least_loaded = min(candidates, key=lambda pooled: len(pooled.contexts))
+        if least_loaded.contexts and len(self._active_browsers()) < self._size:
+            return None
+        return least_loaded
+
+    def _drop_unhealthy(self) -> None:
+        for pooled in list(self._browsers):
+            if pooled.healthy:
+                continue
+            self._health_failures += 1
+            self._logger.warning("[Moodle] Browser %s disconnected, removing from pool", pooled.id)
+            self._browsers.remove(pooled)
+
+    async def _check_retirement(self) -> None:
+        now = time.monotonic()
+        max_navigations = settings.MOODLE_BROWSER_MAX_NAVIGATIONS
+        max_age = settings.MOODLE_BROWSER_MAX_AGE_MINUTES * 60
+        max_rss = settings.MOODLE_BROWSER_MAX_RSS_MB
+        for pooled in self._active_browsers():
+            if now - pooled.rss_checked_at >= _RSS_CHECK_INTERVAL_SECONDS:
+                pooled.rss_mb = await asyncio.to_thread(_process_tree_rss_mb, pooled.marker)
+                pooled.rss_checked_at = now
+            reason = None
+            if max_navigations > 0 and pooled.navigations >= max_navigations:
+                reason = "navigations"
+            elif max_age > 0 and now - pooled.launched_at >= max_age:
+                reason = "age"
+            elif max_rss > 0 and pooled.rss_mb is not None and pooled.rss_mb >= max_rss:
+                reason = "memory"
+            if reason:
+                self._retire(pooled, reason)
+
+    def _retire(self, pooled: _PooledBrowser, reason: str) -> None:
+        pooled.retire_reason = reason
+        self._recycles[reason] += 1
+        self._recycle_events.append(
+            {
+                "browser_id": pooled.id,
+                "reason": reason,
+                "navigations": pooled.navigations,
+                "uptime_seconds": round(time.monotonic() - pooled.launched_at, 1),
+                "rss_mb": pooled.rss_mb,
+                "at": time.time(),
+            }
+        )
+        self._logger.info(
+            "[Moodle] Retiring browser %s (%s, %s navigations, rss=%s MB)",
+            pooled.id,
+            reason,
+            pooled.navigations,
+            pooled.rss_mb,
+        )
+        if not pooled.contexts:
+            self._drain(pooled)
+
+    def _drain(self, pooled: _PooledBrowser) -> None:
+        # Called under the condition; the browser is closed after it is released.
+        self._browsers.remove(pooled)
+        self._drained.append(pooled)
+
+    async def _close_drained(self) -> None:
+        drained, self._drained = self._drained, []
+        for pooled in drained:
+            self._logger.info("[Moodle] Browser %s drained, closing (%s)", pooled.id, pooled.retire_reason)
+            try:
+                await pooled.browser.close()
+            except Exception as exc:
+                self._logger.debug("[Moodle] Browser close failed: %s", exc)
+
+    async def _launch(self) -> _PooledBrowser:
+        started = time.perf_counter()
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+        browser_id = next(self._ids)
+        browser = await self._playwright.chromium.launch(
+            headless=True, args=[_browser_marker(browser_id)]
+        )
+        pooled = _PooledBrowser(id=browser_id, browser=browser, launch_seconds=time.perf_counter() - started)
+        self._browsers.append(pooled)
+        self._launches += 1
+        self._logger.info("[Moodle] Browser %s launched (pool %s/%s)", pooled.id, len(self._browsers), self._size)
+        return pooled
+
+
+def _browser_marker(browser_id: int) -> str:
+    return f"--moodle-pool-browser={os.getpid()}-{browser_id}"
+
+
+def _process_tree_rss_mb(marker: str) -> Optional[float]:
+    # Playwright does not expose the browser PID, so find the process launched with
+    # our marker switch and add up the resident memory of it and its children.
+    try:
+        parents: dict[int, int] = {}
+        root: Optional[int] = None
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                with open(f"/proc/{pid}/stat", "rb") as handle:
+                    stat = handle.read().rsplit(b")", 1)[1].split()
+                parents[pid] = int(stat[1])
+                if root is None and pid != os.getpid():
+                    with open(f"/proc/{pid}/cmdline", "rb") as handle:
+                        if marker.encode() in handle.read():
+                            root = pid
+            except OSError:
+                continue
+        if root is None:
+            return None
+        tree = {root}
+        changed = True
+        while changed:
+            children = {pid for pid, parent in parents.items() if parent in tree and pid not in tree}
+            tree |= children
+            changed = bool(children)
+        total_kb = 0
+        for pid in tree:
+            try:
+                with open(f"/proc/{pid}/status") as handle:
+                    for line in handle:
+                        if line.startswith("VmRSS:"):
+                            total_kb += int(line.split()[1])
+                            break
+            except OSError:
+                continue
+        return round(total_kb / 1024, 1)
+    except OSError:
+        return None
+
+
+_RSS_CHECK_INTERVAL_SECONDS = 30
+_pool: BrowserPool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        _pool = BrowserPool(
+            size=settings.MOODLE_BROWSER_POOL_SIZE,
+            max_contexts_per_browser=settings.MOODLE_MAX_CONTEXTS_PER_BROWSER,
+        )
+        _pool_loop = loop
+    return _pool
+
+
+async def warm_up_browser_pool() -> None:
+    logger = logging.getLogger("moodle")
+    started = time.perf_counter()
+    try:
+        pool = get_browser_pool()
+        lease = await pool.acquire_context()
+        await pool.release_context(lease)
+    except Exception as exc:
+        logger.warning("[Moodle] Browser warm-up failed: %s", exc)
+        return
+    logger.info("[Moodle] Browser warm-up finished in %.2fs", time.perf_counter() - started)
+
+
+async def shutdown_browser_pool() -> None:
+    global _pool, _pool_loop
+    pool = _pool
+    _pool = None
+    _pool_loop = None
+    if pool:
+        await pool.close()
+
+
+def browser_pool_metrics() -> dict[str, Any]:
+    if _pool is None:
+        return {"size": settings.MOODLE_BROWSER_POOL_SIZE, "browsers": [], "contexts_active": 0}
+    return _pool.metrics()
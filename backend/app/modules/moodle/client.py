@@ -1,11 +1,30 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import logging
-from typing import Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Iterable, Optional, TypeVar
 
 from app.core.config import settings
-from playwright.async_api import Browser, Page, Playwright, async_playwright
+from app.modules.moodle.archive import MoodleArchive
+from app.modules.moodle.browser_pool import ContextLease, get_browser_pool
+from app.modules.moodle.crawl_plan import CrawlPlan
+from app.modules.moodle.http_session import HttpPage, MoodleHttpSession
+from app.modules.moodle.page_cache import CachedPage, content_hash, get_page_cache
+from app.modules.moodle.parse_pool import run_parser
+from app.modules.moodle.rate_limit import throttle
+from app.modules.moodle.request_filter import RequestFilter, RequestFilterProfile
+from app.modules.moodle.retry import TransientStatusError, call_with_retry
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_EXHAUSTED = object()
 
 
 class MoodleClient:
@@ -13,52 +32,289 @@ class MoodleClient:
         self.base_url = base_url.rstrip("/")
         self.username = username
         self.password = password
-        self._playwright: Optional[Playwright] = None
-        self._browser: Optional[Browser] = None
+        self._lease: Optional[ContextLease] = None
         self._page: Optional[Page] = None
+        self._idle_pages: list[Page] = []
+        self._pages_in_use = 0
+        self._navigations = 0
+        self._retired_leases: list[ContextLease] = []
+        self._recycle_lock = asyncio.Lock()
+        self._request_filter: Optional[RequestFilter] = None
+        self._http: Optional[MoodleHttpSession] = None
+        self._http_lock = asyncio.Lock()
+        self._page_slots = asyncio.Semaphore(max(1, settings.MOODLE_PAGE_CONCURRENCY))
+        self._archive = MoodleArchive.from_settings(self.base_url, username)
+        self._crawl_plan = CrawlPlan()
         self._logger = logging.getLogger("moodle")
 
-    async def open(self) -> Page:
+    async def open(self, storage_state: Optional[dict] = None) -> Page:
         if self._page:
             return self._page
-        self._playwright = await async_playwright().start()
-        self._browser = await self._playwright.chromium.launch(headless=True)
-        self._page = await self._browser.new_page()
+        if storage_state:
+            self._lease = await get_browser_pool().acquire_context(storage_state=storage_state)
+        else:
+            self._lease = await get_browser_pool().acquire_context()
+        if self._archive:
+            await self._archive.attach(self._lease.context)
+        profile = RequestFilterProfile.from_settings()
+        if profile:
+            self._request_filter = RequestFilter(profile, self.base_url)
+            await self._request_filter.install(self._lease.context)
+        self._page = await self._lease.context.new_page()
         return self._page
 
+    @property
+    def archiving(self) -> bool:
+        return self._archive is not None
+
     @property
     def page(self) -> Page:
         if self._page is None:
             raise RuntimeError("Client not initialized. Call open() first.")
         return self._page
 
+    @property
+    def context(self) -> BrowserContext:
+        if self._lease is None:
+            raise RuntimeError("Client not initialized. Call open() first.")
+        return self._lease.context
+
     async def close(self) -> None:
-        if self._browser:
-            await self._browser.close()
-        if self._playwright:
-            await self._playwright.stop()
-        self._browser = None
-        self._playwright = None
+        lease = self._lease
+        self._lease = None
         self._page = None
+        self._idle_pages = []
+        self._navigations = 0
+        await self._release_retired_leases()
+        if self._http:
+            await self._http.aclose()
+            self._http = None
+        if self._request_filter:
+            self._request_filter.report()
+            self._request_filter = None
+        if lease:
+            await get_browser_pool().release_context(lease)
+        if self._archive:
+            self._archive.save()
+
+    @asynccontextmanager
+    async def lease_page(self) -> AsyncIterator[Page]:
+        async with self._page_slots:
+            await self._maybe_recycle_context()
+            context = self.context
+            page = self._idle_pages.pop() if self._idle_pages else await context.new_page()
+            self._pages_in_use += 1
+            try:
+                yield page
+            finally:
+                self._pages_in_use -= 1
+                if self._lease is not None and self._lease.context is context and not page.is_closed():
+                    self._idle_pages.append(page)
+
+    async def prefetch(
+        self,
+        items: Iterable[T],
+        load: Callable[[T], Awaitable[R]],
+        window: Optional[int] = None,
+    ) -> AsyncIterator[tuple[T, R]]:
+        window = max(0, settings.MOODLE_PREFETCH_WINDOW if window is None else window)
+        remaining = iter(items)
+        pending: deque[tuple[T, asyncio.Future]] = deque()
+
+        def schedule() -> None:
+            while len(pending) <= window:
+                item = next(remaining, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    return
+                pending.append((item, asyncio.ensure_future(load(item))))
+
+        try:
+            schedule()
+            while pending:
+                item, task = pending.popleft()
+                schedule()
+                yield item, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                self._logger.debug("[Moodle] Cancelled %s prefetched loads", len(pending))
+                await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+    async def storage_state(self) -> dict:
+        return await self.context.storage_state()
 
     async def get_page(self, url: str) -> Page:
         if self._page is None:
             raise RuntimeError("Client not initialized. Call open() first.")
-        target = url
-        if url.startswith("/"):
-            target = f"{self.base_url}{url}"
-        elif not url.startswith("http"):
-            target = f"{self.base_url}/{url.lstrip('/')}"
-        for attempt in range(3):
+        if not self._pages_in_use:
+            await self._release_retired_leases()
+        await self._maybe_recycle_context()
+        return await self.goto(self._page, url)
+
+    async def goto(self, page: Page, url: str) -> Page:
+        target = self.resolve_url(url)
+
+        async def navigate() -> Page:
+            await self._throttle(target)
+            response = await page.goto(target, wait_until="domcontentloaded", timeout=30000)
+            self._record_navigation()
+            if response is not None and (response.status == 429 or response.status >= 500):
+                raise TransientStatusError(target, response.status)
+            return page
+
+        return await call_with_retry("page_load", target, navigate)
+
+    async def crawl_once(self, url: str, kind: str, load: Callable[[], Awaitable[T]]) -> T:
+        return await self._crawl_plan.load(self.resolve_url(url), kind, load)
+
+    def forget_crawled(self, urls: Iterable[str]) -> None:
+        self._crawl_plan.forget({self.resolve_url(url) for url in urls})
+
+    def finish_crawl(self) -> dict[str, int]:
+        summary = self._crawl_plan.finish()
+        self._crawl_plan = CrawlPlan()
+        if summary["requested"]:
+            self._logger.info(
+                "[Moodle] Crawl plan: %s urls planned, %s requested, %s shared, %s navigations performed",
+                summary["planned"],
+                summary["requested"],
+                summary["reused"],
+                summary["performed"],
+            )
+        return summary
+
+    async def fetch_html(self, url: str) -> str:
+        return (await self._fetch_page(self.resolve_url(url))).text
+
+    async def post_form(self, url: str, data: list[tuple[str, str]]) -> HttpPage:
+        # Not retried: a form post is not safe to repeat blindly.
+        target = self.resolve_url(url)
+        session = await self._http_session()
+        await self._throttle(target)
+        self._crawl_plan.record_navigation()
+        return await session.post_form(target, data)
+
+    async def _throttle(self, url: str) -> None:
+        if self._archive is None or not self._archive.replaying:
+            await throttle(url)
+
+    def _record_navigation(self) -> None:
+        self._navigations += 1
+        self._crawl_plan.record_navigation()
+        if self._lease is not None:
+            get_browser_pool().record_navigation(self._lease)
+
+    async def _maybe_recycle_context(self) -> None:
+        if self._lease is None or self._pages_in_use or self._archive is not None:
+            return
+        reason = get_browser_pool().retire_reason(self._lease)
+        limit = settings.MOODLE_CONTEXT_MAX_NAVIGATIONS
+        if reason is None and limit > 0 and self._navigations >= limit:
+            reason = "context_navigations"
+        if reason is None:
+            return
+        async with self._recycle_lock:
+            if self._lease is None or self._pages_in_use:
+                return
+            old = self._lease
             try:
-                await self._page.goto(target, wait_until="domcontentloaded", timeout=30000)
-                return self._page
+                state = await old.context.storage_state()
             except Exception as exc:
-                self._logger.warning("[Moodle] Page load attempt %s failed: %s", attempt + 1, exc)
-                if attempt < 2:
-                    await asyncio.sleep(2)
-                else:
-                    raise
+                self._logger.warning("[Moodle] Cannot recycle context (%s): %s", reason, exc)
+                return
+            self._lease = await get_browser_pool().acquire_context(storage_state=state)
+            if self._request_filter:
+                await self._request_filter.install(self._lease.context)
+            self._page = await self._lease.context.new_page()
+            self._idle_pages = []
+            self._navigations = 0
+            # The previous main page may still be read by its caller until the next
+            # get_page(), so the old context is released lazily.
+            self._retired_leases.append(old)
+            self._logger.info(
+                "[Moodle] Recycled browser context (%s): browser %s -> %s",
+                reason,
+                old.browser_id,
+                self._lease.browser_id,
+            )
+
+    async def _release_retired_leases(self) -> None:
+        retired = self._retired_leases
+        self._retired_leases = []
+        for lease in retired:
+            await get_browser_pool().release_context(lease)
+
+    async def fetch_parsed(self, url: str, kind: str, parse: Callable[[str], T]) -> T:
+        # Recording and replay always parse the archived response: cached
+        # results (and 304s) would make both depend on on-disk cache state.
+        cache = None if self._archive is not None else get_page_cache()
+        target = self.resolve_url(url)
+        if cache is None:
+            return await run_parser(parse, await self.fetch_html(target))
+
+        # sqlite commits block; keep them off the loop so concurrent fetches
+        # are not serialized behind each cache read and write.
+        owner = self.cache_owner()
+        entry = await asyncio.to_thread(cache.get, owner, target)
+        known = entry is not None and kind in entry.results
+        page = await self._fetch_page(
+            target,
+            etag=entry.etag if known else None,
+            last_modified=entry.last_modified if known else None,
+        )
+        if page.not_modified and known:
+            cache.stats["hits_not_modified"] += 1
+            return entry.results[kind]
+
+        digest = content_hash(page.text)
+        if entry is not None and entry.content_hash == digest:
+            if kind in entry.results:
+                cache.stats["hits_unchanged"] += 1
+                return entry.results[kind]
+        else:
+            entry = CachedPage(content_hash=digest)
+        cache.stats["misses"] += 1
+        result = await run_parser(parse, page.text)
+        entry.etag = page.etag
+        entry.last_modified = page.last_modified
+        entry.results[kind] = result
+        await asyncio.to_thread(cache.put, owner, target, entry)
+        return result
+
+    async def _fetch_page(
+        self, target: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> HttpPage:
+        session = await self._http_session()
+
+        async def fetch() -> HttpPage:
+            await self._throttle(target)
+            self._crawl_plan.record_navigation()
+            return await session.fetch_page(target, etag=etag, last_modified=last_modified)
+
+        return await call_with_retry("http_fetch", target, fetch)
+
+    def cache_owner(self) -> str:
+        return hashlib.sha256(f"{self.base_url}|{self.username}".encode("utf-8")).hexdigest()
+
+    def resolve_url(self, url: str) -> str:
+        if url.startswith("/"):
+            return f"{self.base_url}{url}"
+        if not url.startswith("http"):
+            return f"{self.base_url}/{url.lstrip('/')}"
+        return url
+
+    async def _http_session(self) -> MoodleHttpSession:
+        async with self._http_lock:
+            if self._http is None:
+                cookies = await self.context.cookies()
+                user_agent = await self.page.evaluate("navigator.userAgent")
+                self._http = MoodleHttpSession(
+                    cookies,
+                    user_agent=user_agent,
+                    transport=self._archive.http_transport() if self._archive else None,
+                )
+            return self._http
 
 
 def build_client_from_credentials(username: str, password: str) -> MoodleClient:
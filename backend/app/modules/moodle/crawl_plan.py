@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+_totals: Counter[str] = Counter()
+_last_run: dict[str, int] = {}
+
+
+class CrawlPlan:
+    # One plan per adapter run: every consumer asks for (url, kind) through
+    # load(), the first ask performs it and later or concurrent asks share it.
+    def __init__(self) -> None:
+        self._loads: dict[tuple[str, str], asyncio.Future] = {}
+        self._waiters: Counter[asyncio.Future] = Counter()
+        self._urls: set[str] = set()
+        self.requested = 0
+        self.reused = 0
+        self.performed = 0
+
+    async def load(self, url: str, kind: str, loader: Callable[[], Awaitable[T]]) -> T:
+        self.requested += 1
+        key = (url, kind)
+        task = self._loads.get(key)
+        if task is None:
+            self._urls.add(url)
+            task = asyncio.ensure_future(loader())
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._loads[key] = task
+        else:
+            self.reused += 1
+        # Shielded so one cancelled consumer doesn't abort a shared load; the
+        # load itself is cancelled once its last consumer has gone away.
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Let a later consumer retry a load that failed for this one.
+            self._drop(key, task)
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] <= 0:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+                    self._drop(key, task)
+
+    def _drop(self, key: tuple[str, str], task: asyncio.Future) -> None:
+        if self._loads.get(key) is task:
+            del self._loads[key]
+
+    def forget(self, urls: set[str]) -> None:
+        for key in [key for key in self._loads if key[0] in urls]:
+            del self._loads[key]
+
+    def record_navigation(self) -> None:
+        self.performed += 1
+
+    def summary(self) -> dict[str, int]:
+        return {
+            "planned": len(self._urls),
+            "requested": self.requested,
+            "reused": self.reused,
+            "performed": self.performed,
+        }
+
+    def finish(self) -> dict[str, int]:
+        global _last_run
+        for task in self._loads.values():
+            task.cancel()
+        summary = self.summary()
+        if summary["requested"] or summary["performed"]:
+            _last_run = summary
+            _totals.update(summary)
+            _totals["runs"] += 1
+        return summary
+
+
+def crawl_plan_metrics() -> dict[str, Any]:
+    return {"last_run": dict(_last_run), "totals": dict(_totals)}
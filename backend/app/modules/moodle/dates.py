@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from datetime import datetime, timezone, tzinfo
+from functools import lru_cache
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.modules.moodle.text import normalize_for_compare, normalize_text
+
+_MONTHS = {
+    "enero": 1,
+    "febrero": 2,
+    "marzo": 3,
+    "abril": 4,
+    "mayo": 5,
+    "junio": 6,
+    "julio": 7,
+    "agosto": 8,
+    "septiembre": 9,
+    "setiembre": 9,
+    "octubre": 10,
+    "noviembre": 11,
+    "diciembre": 12,
+}
+
+# The layouts Moodle's Spanish language pack renders (strftimedatetime,
+# strftimedaydate, strftimedatetimeshort), matched on accent-stripped lowercase.
+_TIME = r"(?:,?\s+(?P<hour>\d{1,2}):(?P<minute>\d{2})(?:\s*(?P<meridiem>[ap])\.?\s?m\.?)?)?"
+_LONG_DATE = re.compile(
+    r"^(?:[a-z]+,?\s+)?(?P<day>\d{1,2})\s+de\s+(?P<month>[a-z]+)\s+de\s+(?P<year>\d{4})" + _TIME + r"$"
+)
+_SHORT_DATE = re.compile(r"^(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{2}|\d{4})" + _TIME + r"$")
+
+_stats: Counter[str] = Counter()
+
+
+# Moodle renders wall-clock times in the site timezone; they are stored as
+# real UTC instants so they line up with the web services epochs.
+@lru_cache(maxsize=1)
+def _site_timezone() -> tzinfo:
+    try:
+        return ZoneInfo(settings.APP_TIMEZONE)
+    except Exception:
+        return timezone.utc
+
+
+def parse_spanish_datetime(value: str) -> datetime | None:
+    if not value:
+        return None
+    _stats["calls"] += 1
+    cleaned = normalize_text(value)
+    parsed = _parse_fast(cleaned)
+    if parsed is not None:
+        _stats["fast_path"] += 1
+        return parsed
+    # dateparser results are not memoized: relative phrases depend on the clock.
+    _stats["dateparser"] += 1
+    parsed = _parse_with_dateparser(cleaned)
+    if parsed is None:
+        _stats["unparsed"] += 1
+    return parsed
+
+
+@lru_cache(maxsize=4096)
+def _parse_fast(cleaned: str) -> datetime | None:
+    text = normalize_for_compare(cleaned)
+    match = _LONG_DATE.match(text)
+    if match:
+        month = _MONTHS.get(match.group("month"))
+    else:
+        match = _SHORT_DATE.match(text)
+        month = int(match.group("month")) if match else None
+    if not match or not month:
+        return None
+    year = int(match.group("year"))
+    if year < 100:
+        year += 2000
+    hour = int(match.group("hour") or 0)
+    minute = int(match.group("minute") or 0)
+    meridiem = match.group("meridiem")
+    if meridiem == "p" and hour < 12:
+        hour += 12
+    elif meridiem == "a" and hour == 12:
+        hour = 0
+    try:
+        local = datetime(year, month, int(match.group("day")), hour, minute, tzinfo=_site_timezone())
+    except ValueError:
+        return None
+    return local.astimezone(timezone.utc)
+
+
+def _parse_with_dateparser(cleaned: str) -> datetime | None:
+    import dateparser
+
+    parsed = dateparser.parse(
+        cleaned,
+        languages=["es"],
+        settings={
+            "RETURN_AS_TIMEZONE_AWARE": True,
+            "TIMEZONE": settings.APP_TIMEZONE,
+            "TO_TIMEZONE": "UTC",
+            "PREFER_DAY_OF_MONTH": "first",
+        },
+    )
+    if not parsed:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=_site_timezone()).astimezone(timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def date_parser_metrics() -> dict[str, Any]:
+    cache = _parse_fast.cache_info()
+    parsed = _stats["fast_path"] + _stats["dateparser"]
+    return {
+        **_stats,
+        "memo_hits": cache.hits,
+        "memo_size": cache.currsize,
+        "fast_path_rate": round(_stats["fast_path"] / parsed, 3) if parsed else None,
+        "memo_hit_rate": round(cache.hits / _stats["calls"], 3) if _stats["calls"] else None,
+    }
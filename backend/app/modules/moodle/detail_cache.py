@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+_FINGERPRINT_KEYS = ("id", "title", "item_type", "grade_value", "grade_display", "url")
+
+
+def row_fingerprint(base: dict) -> str:
+    payload = json.dumps([base.get(key) for key in _FINGERPRINT_KEYS], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DetailCache:
+    def __init__(self, path: str, ttl_seconds: int, due_window_seconds: int) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_seconds = ttl_seconds
+        self._due_window_seconds = due_window_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS details ("
+            " owner TEXT NOT NULL, url TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " fields TEXT NOT NULL, stored_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, url))"
+        )
+        self._db.commit()
+        self.stats: Counter[str] = Counter()
+
+    def get(self, owner: str, url: str, fingerprint: str, graded: bool) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint, fields, stored_at FROM details WHERE owner = ? AND url = ?",
+                (owner, url),
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        if row[0] != fingerprint:
+            self.stats["fingerprint_changed"] += 1
+            return None
+        if time.time() - row[2] > self._ttl_seconds:
+            self.stats["expired"] += 1
+            return None
+        fields = json.loads(row[1])
+        # Dates, submission and grading status move around the deadline even when
+        # the grade row itself looks the same.
+        if self._due_soon(fields.get("due_at")):
+            self.stats["due_soon"] += 1
+            return None
+        if not self.settled(fields, graded):
+            self.stats["unsettled"] += 1
+            return None
+        self.stats["hits"] += 1
+        return fields
+
+    def put(self, owner: str, url: str, fingerprint: str, fields: dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO details (owner, url, fingerprint, fields, stored_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (owner, url, fingerprint, json.dumps(fields), time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM details WHERE stored_at < ?", (time.time() - self._ttl_seconds,)
+            )
+            self._db.commit()
+
+    def settled(self, fields: dict, graded: bool) -> bool:
+        # Handing work in changes submission_status without touching the grade
+        # row, so assignment details are only reused once graded or closed.
+        if "submission_status" not in fields or graded:
+            return True
+        due = _parse_due(fields.get("due_at"))
+        return due is not None and due < datetime.now(timezone.utc)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM details").fetchone()
+        return {"entries": count, **self.stats}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _due_soon(self, due_at: Optional[str]) -> bool:
+        if not due_at:
+            return False
+        due = _parse_due(due_at)
+        if due is None:
+            return True
+        remaining = (due - datetime.now(timezone.utc)).total_seconds()
+        return abs(remaining) <= self._due_window_seconds
+
+
+def _parse_due(due_at: Optional[str]) -> Optional[datetime]:
+    if not due_at:
+        return None
+    try:
+        due = datetime.fromisoformat(due_at)
+    except ValueError:
+        return None
+    if due.tzinfo is None:
+        due = due.replace(tzinfo=timezone.utc)
+    return due
+
+
+_cache: DetailCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_detail_cache() -> DetailCache | None:
+    global _cache
+    if not settings.MOODLE_DETAIL_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetailCache(
+                settings.MOODLE_DETAIL_CACHE_PATH,
+                ttl_seconds=settings.MOODLE_DETAIL_CACHE_TTL_SECONDS,
+                due_window_seconds=settings.MOODLE_DETAIL_CACHE_DUE_WINDOW_HOURS * 3600,
+            )
+    return _cache
+
+
+def detail_cache_metrics() -> dict[str, Any]:
+    if _cache is None:
+        return {}
+    return _cache.metrics()
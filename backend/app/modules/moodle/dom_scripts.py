@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+# In-page scripts for the interactive survey pages: each one walks the DOM once
+# and returns plain JSON instead of paying one round trip per field. Read-only
+# extraction goes through parsers.py on the page HTML instead.
+
+FEEDBACK_FILL = """
+(defaultText) => {
+  const form = document.querySelector("form#feedback_complete_form")
+    || document.querySelector("form")
+    || document.querySelector("form.feedback_form")
+    || document.querySelector("form[action*='mod/feedback/complete.php']");
+  if (!form) {
+    const login = document.querySelector("input[name='username'], input[name='password']");
+    return { found: false, reason: login ? "login_required" : "form_not_found" };
+  }
+  const changed = (el) => {
+    el.dispatchEvent(new Event("input", { bubbles: true }));
+    el.dispatchEvent(new Event("change", { bubbles: true }));
+  };
+  const filled = { radio: 0, checkbox: 0, select: 0, text: 0 };
+  for (const type of ["radio", "checkbox"]) {
+    const groups = new Map();
+    for (const el of form.querySelectorAll(`input[type='${type}'][name]`)) {
+      if (!groups.has(el.name)) groups.set(el.name, []);
+      groups.get(el.name).push(el);
+    }
+    for (const group of groups.values()) {
+      if (group.some((el) => el.checked) || group[0].disabled) continue;
+      group[0].click();
+      filled[type] += 1;
+    }
+  }
+  for (const select of form.querySelectorAll("select[name]")) {
+    if (select.querySelector("option[selected]") && select.value !== "") continue;
+    const values = Array.from(select.options).map((option) => option.value);
+    const chosen = values.find((value) => value !== "") ?? values[0];
+    if (chosen === undefined) continue;
+    select.value = chosen;
+    changed(select);
+    filled.select += 1;
+  }
+  const fields = form.querySelectorAll(
+    "textarea[name], input[type='text'][name], input[type='number'][name], input[type='email'][name]"
+  );
+  for (const field of fields) {
+    if (field.value.trim()) continue;
+    field.value = field.type === "number" ? field.min || "0" : defaultText;
+    changed(field);
+    filled.text += 1;
+  }
+  return {
+    found: true,
+    filled,
+    hasSubmit: !!document.querySelector("form#feedback_complete_form input[type='submit'][name='savevalues']"),
+  };
+}
+"""
+
+COMPLETION_STATUS = """
+({ pending, completed, messages }) => {
+  const normalize = (value) => (value || "").normalize("NFKD").replace(/[\\u0300-\\u036f]/g, "")
+    .toLowerCase().replace(/\\s+/g, " ").trim();
+  const matches = (text, phrases) => phrases.some((phrase) => text.includes(phrase));
+  const formPresent = !!document.querySelector("form#feedback_complete_form");
+  const badgeNode = document.querySelector(".completion-info");
+  const badge = normalize(badgeNode ? badgeNode.textContent : "");
+  if (matches(badge, pending)) return { formPresent, completed: false, reason: "completion_pending" };
+  if (matches(badge, completed)) return { formPresent, completed: true, reason: "completion_badge" };
+  if (matches(normalize(document.body ? document.body.textContent : ""), messages)) {
+    return { formPresent, completed: true, reason: "completion_text" };
+  }
+  return { formPresent, completed: null, reason: null };
+}
+"""
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import urlparse
+
+from app.modules.moodle.labels import COMPLETION_BADGES, COMPLETION_MESSAGES
+
+if TYPE_CHECKING:
+    from selectolax.lexbor import LexborNode
+
+FEEDBACK_DEFAULT_TEXT = "Sin comentarios."
+
+_GROUP = "group"
+_SELECT = "select"
+_TEXT = "text"
+_TEXT_TYPES = {"text", "number", "email"}
+_PLAN_CACHE_SIZE = 256
+# Plans are shared across forms with the same shape, so answers already on a
+# form are referenced, never copied: apply_fill_plan reads them from the form.
+_KEEP = object()
+
+
+@dataclass(frozen=True)
+class FormOption:
+    value: str
+    checked: bool = False
+    disabled: bool = False
+
+
+@dataclass
+class FormField:
+    kind: str
+    name: str
+    input_type: str
+    options: list[FormOption] = field(default_factory=list)
+    value: str = ""
+    minimum: str = ""
+
+
+@dataclass
+class FeedbackForm:
+    action: str
+    hidden: list[tuple[str, str]]
+    fields: list[FormField]
+    submit: Optional[tuple[str, str]]
+
+    @property
+    def fingerprint(self) -> str:
+        # Item names carry per-instance ids, so the shape is described by
+        # position, type, option values and prefilled state only.
+        shape = [
+            [
+                item.kind,
+                item.input_type,
+                [[option.value, option.checked, option.disabled] for option in item.options],
+                bool(item.value.strip()),
+                item.minimum,
+            ]
+            for item in self.fields
+        ]
+        return hashlib.sha256(json.dumps(shape).encode("utf-8")).hexdigest()
+
+
+# The metrics endpoint imports this module, so the parser loads on first use.
+def parse_feedback_form(html: str) -> Optional[FeedbackForm]:
+    from selectolax.lexbor import LexborHTMLParser
+
+    form = LexborHTMLParser(html).css_first("form#feedback_complete_form")
+    if form is None:
+        return None
+    hidden: list[tuple[str, str]] = []
+    fields: list[FormField] = []
+    groups: dict[tuple[str, str], FormField] = {}
+    submit = None
+    for node in form.css("input[name], select[name], textarea[name]"):
+        name = node.attributes.get("name") or ""
+        if node.tag == "select":
+            fields.append(FormField(_SELECT, name, "select", options=_select_options(node)))
+            continue
+        if node.tag == "textarea":
+            fields.append(FormField(_TEXT, name, "textarea", value=node.text() or ""))
+            continue
+        input_type = (node.attributes.get("type") or "text").lower()
+        value = node.attributes.get("value") or ""
+        if input_type == "hidden":
+            hidden.append((name, value))
+        elif input_type == "submit":
+            if name == "savevalues":
+                submit = (name, value)
+        elif input_type in ("radio", "checkbox"):
+            group = groups.get((input_type, name))
+            if group is None:
+                group = groups[(input_type, name)] = FormField(_GROUP, name, input_type)
+                fields.append(group)
+            group.options.append(
+                FormOption(value or "on", "checked" in node.attributes, "disabled" in node.attributes)
+            )
+        elif input_type in _TEXT_TYPES:
+            fields.append(
+                FormField(_TEXT, name, input_type, value=value, minimum=node.attributes.get("min") or "")
+            )
+    return FeedbackForm(form.attributes.get("action") or "", hidden, fields, submit)
+
+
+# Mirrors dom_scripts.COMPLETION_STATUS for a page answered over HTTP: returns
+# the completion reason, or None when the response does not confirm one.
+def submission_confirmation(html: str, url: Optional[str]) -> Optional[str]:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    if tree.css_first("form#feedback_complete_form") is not None:
+        return None
+    badge = tree.css_first(".completion-info")
+    state = COMPLETION_BADGES.classify(badge.text(deep=True) or "") if badge is not None else None
+    if state == "pending":
+        return None
+    if state == "completed":
+        return "completion_badge"
+    body = tree.body
+    if body is not None and COMPLETION_MESSAGES.classify(body.text(deep=True) or ""):
+        return "completion_text"
+    if url and urlparse(url).path.endswith("/mod/feedback/view.php"):
+        return "feedback_view"
+    return None
+
+
+def _select_options(node: LexborNode) -> list[FormOption]:
+    options = []
+    for option in node.css("option"):
+        value = option.attributes.get("value")
+        options.append(
+            FormOption(
+                value if value is not None else (option.text() or "").strip(),
+                "selected" in option.attributes,
+                "disabled" in option.attributes,
+            )
+        )
+    return options
+
+
+# Same policy as dom_scripts.FEEDBACK_FILL: keep answers already given, else
+# take the first enabled option / first non-empty select value / default text.
+def build_fill_plan(form: FeedbackForm) -> list[Any]:
+    plan: list[Any] = []
+    for item in form.fields:
+        if item.kind == _GROUP:
+            if any(option.checked for option in item.options):
+                plan.append(_KEEP)
+            elif item.options and not item.options[0].disabled:
+                plan.append([0])
+            else:
+                plan.append([])
+        elif item.kind == _SELECT:
+            if _selected_value(item):
+                plan.append(_KEEP)
+                continue
+            values = [option.value for option in item.options]
+            chosen = next((idx for idx, value in enumerate(values) if value != ""), 0 if values else None)
+            plan.append(chosen)
+        elif item.value.strip():
+            plan.append(_KEEP)
+        else:
+            plan.append((item.minimum or "0") if item.input_type == "number" else FEEDBACK_DEFAULT_TEXT)
+    return plan
+
+
+def apply_fill_plan(form: FeedbackForm, plan: list[Any]) -> list[tuple[str, str]]:
+    data = list(form.hidden)
+    for item, choice in zip(form.fields, plan):
+        if item.kind == _GROUP:
+            if choice is _KEEP:
+                data.extend((item.name, option.value) for option in item.options if option.checked)
+            else:
+                data.extend((item.name, item.options[idx].value) for idx in choice)
+        elif item.kind == _SELECT:
+            if choice is _KEEP:
+                data.append((item.name, _selected_value(item)))
+            elif choice is not None:
+                data.append((item.name, item.options[choice].value))
+        else:
+            data.append((item.name, item.value if choice is _KEEP else choice))
+    if form.submit:
+        data.append(form.submit)
+    return data
+
+
+def _selected_value(item: FormField) -> str:
+    return next((option.value for option in item.options if option.checked), "")
+
+
+_plans: OrderedDict[str, list[Any]] = OrderedDict()
+_plans_lock = threading.Lock()
+_stats: Counter[str] = Counter()
+
+
+def fill_plan_for(form: FeedbackForm) -> list[Any]:
+    fingerprint = form.fingerprint
+    with _plans_lock:
+        plan = _plans.get(fingerprint)
+        if plan is not None:
+            _plans.move_to_end(fingerprint)
+            _stats["plan_hits"] += 1
+            return plan
+    plan = build_fill_plan(form)
+    with _plans_lock:
+        _stats["plan_misses"] += 1
+        _plans[fingerprint] = plan
+        while len(_plans) > _PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def record_submission(outcome: str) -> None:
+    _stats[outcome] += 1
+
+
+def feedback_form_metrics() -> dict[str, Any]:
+    with _plans_lock:
+        cached = len(_plans)
+    return {"cached_plans": cached, **_stats}
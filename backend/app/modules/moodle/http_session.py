@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlencode
+
+import httpx
+
+from app.core.config import settings
+
+
+class SessionExpiredError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class HttpPage:
+    status: int
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    url: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+class MoodleHttpSession:
+    def __init__(
+        self,
+        cookies: list[dict],
+        user_agent: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        headers = {"Accept": "text/html,application/xhtml+xml"}
+        if user_agent:
+            headers["User-Agent"] = user_agent
+        self._client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0),
+            headers=headers,
+            limits=httpx.Limits(
+                max_connections=settings.MOODLE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MOODLE_HTTP_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+        for cookie in cookies:
+            self._client.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+    async def fetch_html(self, url: str) -> str:
+        return (await self.fetch_page(url)).text
+
+    async def fetch_page(
+        self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> HttpPage:
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = await self._client.get(url, headers=headers)
+        if "/login/index.php" in response.url.path:
+            raise SessionExpiredError(f"Moodle session expired while fetching {url}")
+        if response.status_code == 304:
+            return HttpPage(status=304, text="", etag=etag, last_modified=last_modified)
+        response.raise_for_status()
+        return HttpPage(
+            status=response.status_code,
+            text=response.text,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            url=str(response.url),
+        )
+
+    async def post_form(self, url: str, data: list[tuple[str, str]]) -> HttpPage:
+        # Encoded by hand: repeated names (checkbox groups) need a pair list,
+        # which httpx's data= only accepts as a dict.
+        response = await self._client.post(
+            url,
+            content=urlencode(data),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if "/login/index.php" in response.url.path:
+            raise SessionExpiredError(f"Moodle session expired while posting {url}")
+        response.raise_for_status()
+        return HttpPage(status=response.status_code, text=response.text, url=str(response.url))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
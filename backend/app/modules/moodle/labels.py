@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+from app.modules.moodle.text import normalize_for_compare
+
+# Labels repeat across every row and page, so short ones are normalized once;
+# long blobs (page bodies) skip the cache instead of flushing it.
+_CACHED_LENGTH = 256
+
+
+@lru_cache(maxsize=8192)
+def _normalize_cached(value: str) -> str:
+    return normalize_for_compare(value)
+
+
+def normalize_label(value: str) -> str:
+    if len(value) > _CACHED_LENGTH:
+        return normalize_for_compare(value)
+    return _normalize_cached(value)
+
+
+class LabelClassifier:
+    # Categories are checked in declaration order, each with one compiled
+    # alternation of its phrases; phrases are written already normalized.
+    def __init__(self, categories: dict[str, tuple[str, ...]]) -> None:
+        self.categories = categories
+        self._patterns = [
+            (label, re.compile("|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))))
+            for label, phrases in categories.items()
+        ]
+
+    def classify(self, value: str) -> Optional[str]:
+        if not value:
+            return None
+        text = normalize_label(value)
+        for label, pattern in self._patterns:
+            if pattern.search(text):
+                return label
+        return None
+
+
+SURVEY_NAMES = LabelClassifier({"survey": ("envianos tu opinion", "send us your opinion")})
+
+GRADE_ITEM_TYPES = LabelClassifier(
+    {
+        "assignment": ("tarea", "assignment"),
+        "quiz": ("cuestionario", "quiz"),
+    }
+)
+
+ACTIVITY_DATES = LabelClassifier(
+    {
+        "available_at": ("apertura", "abre", "abrio", "opened:", "opens:"),
+        "due_at": ("cierre", "cierra", "cerro", "due:", "closes:", "closed:"),
+    }
+)
+
+SUBMISSION_ROWS = LabelClassifier(
+    {
+        "submission_status": ("estado de la entrega", "submission status"),
+        "grading_status": ("estado de la calificacion", "grading status"),
+        "last_submission_at": ("ultima modificacion", "last modified"),
+    }
+)
+
+QUIZ_INFO = LabelClassifier(
+    {
+        "attempts_allowed": ("intentos permitidos", "attempts allowed"),
+        "time_limit_minutes": ("limite de tiempo", "time limit"),
+    }
+)
+
+COMPLETION_BADGES = LabelClassifier(
+    {
+        "pending": ("por hacer", "to do"),
+        "completed": ("completado", "completo", "done"),
+    }
+)
+
+COMPLETION_MESSAGES = LabelClassifier(
+    {
+        "completed": (
+            "gracias por completar",
+            "gracias por enviar",
+            "respuestas han sido enviadas",
+            "respuestas han sido guardadas",
+            "respuestas guardadas",
+            "ya ha completado",
+            "ya has completado",
+            "ya respondio",
+            "thanks for completing",
+            "thank you for completing",
+            "your answers have been saved",
+            "you have already completed",
+            "you've already completed",
+        ),
+    }
+)
+
+
+def matches_survey_name(value: str) -> bool:
+    return SURVEY_NAMES.classify(value) is not None
+
+
+def map_grade_item_type(value: str) -> str | None:
+    return GRADE_ITEM_TYPES.classify(value)
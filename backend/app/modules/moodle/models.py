@@ -18,6 +18,9 @@ class MoodleModule:
     block_reason: Optional[str]
     has_survey: bool
     url: Optional[str]
+    # Course-module ids listed for a section on the course page; None when
+    # the page does not show the section's contents.
+    activity_ids: Optional[tuple[str, ...]] = None
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from playwright.async_api import Locator, Page
+
+LOGGED_IN = "logged_in"
+LOGIN_ERROR = "login_error"
+
+_LOGIN_STATE_JS = """
+() => {
+  if (document.querySelector(
+    "body#page-my-index, #user-menu-toggle, a[href*='logout'], body.loggedin, [data-userid]"
+  )) return "logged_in";
+  if (document.querySelector("input[name='password']")
+      && document.querySelector("#loginerrormessage, .loginerrors, .alert-danger")) return "login_error";
+  return "";
+}
+"""
+
+
+@dataclass(frozen=True)
+class PageReadiness:
+    name: str
+    predicate: str
+    timeout_ms: int = 10000
+
+
+LOGIN_RESULT = PageReadiness("login_result", _LOGIN_STATE_JS, timeout_ms=15000)
+DASHBOARD_COURSES = PageReadiness(
+    "dashboard_courses",
+    "() => !!document.querySelector(\"[data-region='course-content'][data-course-id]\")",
+    timeout_ms=5000,
+)
+GRADE_REPORT = PageReadiness(
+    "grade_report",
+    "() => !!document.querySelector('table.user-grade, #region-main')",
+    timeout_ms=5000,
+)
+FEEDBACK_FORM = PageReadiness(
+    "feedback_form",
+    "() => !!document.querySelector("
+    "\"form#feedback_complete_form, input[name='password'], #region-main\")",
+)
+FEEDBACK_SUBMITTED = PageReadiness(
+    "feedback_submitted",
+    "() => !document.querySelector('form#feedback_complete_form')"
+    " || !!document.querySelector('.completion-info, .alert, [role=\"alert\"], .error')",
+)
+
+_counters: Counter[str] = Counter()
+_wait_ms: Counter[str] = Counter()
+
+
+async def wait_until_ready(page: Page, readiness: PageReadiness) -> Optional[Any]:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    started = time.perf_counter()
+    try:
+        handle = await page.wait_for_function(readiness.predicate, timeout=readiness.timeout_ms)
+        result = await handle.json_value()
+    except PlaywrightTimeoutError:
+        _counters[f"{readiness.name}.timeouts"] += 1
+        result = None
+    _counters[f"{readiness.name}.waits"] += 1
+    _wait_ms[readiness.name] += int((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def login_state(page: Page) -> str:
+    return await page.evaluate(_LOGIN_STATE_JS)
+
+
+async def click_and_wait_for_navigation(page: Page, target: Locator, timeout_ms: int = 30000) -> bool:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    try:
+        async with page.expect_navigation(wait_until="domcontentloaded", timeout=timeout_ms):
+            await target.click()
+    except PlaywrightTimeoutError:
+        _counters["navigation.timeouts"] += 1
+        return False
+    return True
+
+
+def navigation_metrics() -> dict[str, Any]:
+    return {
+        "counters": dict(_counters),
+        "wait_ms": dict(_wait_ms),
+    }
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+# Moodle stamps every response with per-request tokens (sesskey, YUI ids, inline
+# M.cfg scripts); strip them so unchanged pages hash identically across runs.
+_VOLATILE_PATTERNS = [
+    re.compile(r"<script\b.*?</script>", re.IGNORECASE | re.DOTALL),
+    re.compile(r"sesskey\W+(?:value\W+)?\w+"),
+    re.compile(r"yui_[\w-]+"),
+    re.compile(r"\b(?:id|for|aria-\w+)=\"[^\"]*\d{6,}[^\"]*\""),
+]
+
+
+def content_hash(html: str) -> str:
+    for pattern in _VOLATILE_PATTERNS:
+        html = pattern.sub("", html)
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedPage:
+    content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    results: dict[str, Any] = field(default_factory=dict)
+
+
+class PageCache:
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max(1, max_entries)
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " owner TEXT NOT NULL, url TEXT NOT NULL, payload BLOB NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, url))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_pages_accessed_at ON pages (accessed_at)")
+        self._db.commit()
+        self.stats: Counter[str] = Counter()
+
+    def get(self, owner: str, url: str) -> Optional[CachedPage]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload, stored_at FROM pages WHERE owner = ? AND url = ?", (owner, url)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self._ttl_seconds:
+                self._db.execute("DELETE FROM pages WHERE owner = ? AND url = ?", (owner, url))
+                self._db.commit()
+                self.stats["expired"] += 1
+                return None
+            self._db.execute(
+                "UPDATE pages SET accessed_at = ? WHERE owner = ? AND url = ?", (now, owner, url)
+            )
+            self._db.commit()
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return None
+
+    def put(self, owner: str, url: str, entry: CachedPage) -> None:
+        now = time.time()
+        payload = pickle.dumps(entry)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (owner, url, payload, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (owner, url, payload, now, now),
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()
+            overflow = count - self._max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM pages WHERE rowid IN"
+                    " (SELECT rowid FROM pages ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.stats["evictions"] += overflow
+            self._db.commit()
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()
+        return {"entries": count, "max_entries": self._max_entries, **self.stats}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_cache: PageCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache | None:
+    global _cache
+    if not settings.MOODLE_PAGE_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache(
+                settings.MOODLE_PAGE_CACHE_PATH,
+                max_entries=settings.MOODLE_PAGE_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.MOODLE_PAGE_CACHE_TTL_SECONDS,
+            )
+    return _cache
+
+
+def page_cache_metrics() -> dict[str, Any]:
+    if _cache is None:
+        return {}
+    return _cache.metrics()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+_stats = {"jobs": 0, "inline_jobs": 0, "seconds": 0.0}
+
+
+def get_parse_executor() -> Executor | None:
+    global _executor
+    workers = settings.MOODLE_PARSE_WORKERS
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            if settings.MOODLE_PARSE_EXECUTOR.strip().lower() == "process":
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moodle-parse")
+    return _executor
+
+
+async def run_parser(fn: Callable[..., T], *args: Any) -> T:
+    started = time.perf_counter()
+    executor = get_parse_executor()
+    try:
+        if executor is None:
+            _stats["inline_jobs"] += 1
+            return fn(*args)
+        _stats["jobs"] += 1
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+    finally:
+        _stats["seconds"] += time.perf_counter() - started
+
+
+def shutdown_parse_pool() -> None:
+    global _executor
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_pool_metrics() -> dict[str, Any]:
+    return {
+        "executor": settings.MOODLE_PARSE_EXECUTOR if settings.MOODLE_PARSE_WORKERS > 0 else "inline",
+        "workers": settings.MOODLE_PARSE_WORKERS,
+        "jobs": _stats["jobs"],
+        "inline_jobs": _stats["inline_jobs"],
+        "parse_seconds": round(_stats["seconds"], 3),
+    }
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+
+from app.modules.moodle.dates import parse_spanish_datetime
+from app.modules.moodle.labels import (
+    ACTIVITY_DATES,
+    QUIZ_INFO,
+    SUBMISSION_ROWS,
+    map_grade_item_type,
+    matches_survey_name,
+)
+from app.modules.moodle.models import MoodleCourse, MoodleGradeItem, MoodleModule, MoodleModuleSurvey
+from app.modules.moodle.text import (
+    clean_course_name,
+    extract_activity_id_from_url,
+    extract_course_id,
+    format_datetime,
+    map_grade_item_type_from_url,
+    normalize_text,
+    parse_duration_minutes,
+    parse_grade_value,
+    parse_int_after_label,
+    split_after_label,
+)
+
+
+ACTIVITY_DATE_SELECTORS = [
+    ".activity-dates div",
+    "[data-region='activity-dates'] div",
+    ".activity-information .activity-dates div",
+]
+ACTIVITY_DATE_CONTAINERS = [
+    ".activity-dates",
+    "[data-region='activity-dates']",
+    ".activity-information .activity-dates",
+]
+
+
+def build_grade_entry(
+    course_id: str,
+    idx: int,
+    title: str,
+    url: str,
+    item_type_label: str,
+    grade_display: str,
+    item_type_filter: set[str] | None = None,
+) -> Optional[dict]:
+    title = normalize_text(title)
+    external_id = extract_activity_id_from_url(url) or f"{course_id}-item-{idx + 1}"
+    item_type = map_grade_item_type(normalize_text(item_type_label))
+    if not item_type and url:
+        item_type = map_grade_item_type_from_url(url)
+    if item_type_filter and item_type not in item_type_filter:
+        return None
+    if not item_type:
+        return None
+    grade_display = normalize_text(grade_display)
+    grade_value = parse_grade_value(grade_display)
+    if grade_value is None:
+        grade_display = ""
+    return {
+        "id": external_id,
+        "course_id": course_id,
+        "title": title or f"Actividad {idx + 1}",
+        "item_type": item_type,
+        "grade_value": grade_value,
+        "grade_display": grade_display or None,
+        "url": url or None,
+    }
+
+
+def build_grade_item(base: dict, details: dict) -> MoodleGradeItem:
+    url = base.get("url")
+    fields: dict = {}
+    if url and "mod/assign/view.php" in url:
+        keys = ("available_at", "due_at", "submission_status", "grading_status", "last_submission_at")
+        fields = {key: details.get(key) for key in keys}
+    elif url and "mod/quiz/view.php" in url:
+        keys = ("available_at", "due_at", "attempts_allowed", "time_limit_minutes")
+        fields = {key: details.get(key) for key in keys}
+    return MoodleGradeItem(
+        id=base["id"],
+        course_id=base["course_id"],
+        title=base["title"],
+        item_type=base["item_type"],
+        grade_value=base["grade_value"],
+        grade_display=base["grade_display"],
+        url=url,
+        available_at=fields.get("available_at"),
+        due_at=fields.get("due_at"),
+        submission_status=fields.get("submission_status"),
+        grading_status=fields.get("grading_status"),
+        last_submission_at=fields.get("last_submission_at"),
+        attempts_allowed=fields.get("attempts_allowed"),
+        time_limit_minutes=fields.get("time_limit_minutes"),
+    )
+
+
+def build_module_survey(
+    module: MoodleModule,
+    idx: int,
+    class_attr: str,
+    title: str,
+    activity_id: Optional[str],
+    href: str,
+    base_url: str,
+) -> Optional[MoodleModuleSurvey]:
+    if "modtype_feedback" not in class_attr and "modtype_survey" not in class_attr:
+        return None
+    title = normalize_text(title)
+    if not matches_survey_name(title):
+        return None
+    activity_id = activity_id or f"survey-{idx + 1}"
+    completion_url = None
+    if activity_id.isdigit() and module.course_id.isdigit():
+        completion_url = (
+            f"{base_url.rstrip('/')}/mod/feedback/complete.php"
+            f"?id={activity_id}&courseid={module.course_id}"
+        )
+    return MoodleModuleSurvey(
+        id=activity_id,
+        module_id=module.id,
+        course_id=module.course_id,
+        title=title or "Enviar encuesta",
+        url=href or None,
+        completion_url=completion_url,
+    )
+
+
+def pick_course_name(candidates: list[str]) -> str:
+    for candidate in candidates:
+        name = clean_course_name(candidate)
+        if name:
+            return name
+    return ""
+
+
+def is_survey_activity(class_attr: str, title: str) -> bool:
+    if "modtype_feedback" not in class_attr and "modtype_survey" not in class_attr:
+        return False
+    return matches_survey_name(title)
+
+
+def parse_activity_date_lines(lines: list[str]) -> tuple[str | None, str | None]:
+    available_at = None
+    due_at = None
+    for line in lines:
+        text = normalize_text(line)
+        if not text:
+            continue
+        kind = ACTIVITY_DATES.classify(text)
+        if kind == "available_at":
+            available_at = format_datetime(parse_spanish_datetime(split_after_label(text)))
+        elif kind == "due_at":
+            due_at = format_datetime(parse_spanish_datetime(split_after_label(text)))
+    return available_at, due_at
+
+
+def apply_submission_status_row(details: dict, label: str, value: str) -> None:
+    value = normalize_text(value)
+    field = SUBMISSION_ROWS.classify(label)
+    if field == "last_submission_at":
+        details[field] = format_datetime(parse_spanish_datetime(value))
+    elif field:
+        details[field] = value or None
+
+
+def apply_quiz_info_line(details: dict, text: str) -> None:
+    text = normalize_text(text)
+    field = QUIZ_INFO.classify(text)
+    if field == "attempts_allowed":
+        details[field] = parse_int_after_label(text)
+    elif field == "time_limit_minutes":
+        details[field] = parse_duration_minutes(text)
+
+
+def parse_courses(html: str) -> list[MoodleCourse]:
+    tree = LexborHTMLParser(html)
+    courses: dict[str, MoodleCourse] = {}
+    for card in tree.css("[data-region='course-content'][data-course-id]"):
+        course_id = card.attributes.get("data-course-id")
+        link = card.css_first("a.coursename")
+        if not course_id or link is None or not link.attributes.get("href"):
+            continue
+        courses[course_id] = MoodleCourse(
+            id=course_id, name=pick_course_name(_course_name_candidates(link)) or f"Course {course_id}"
+        )
+    if not courses:
+        for link in tree.css("a[href*='course/view.php?id=']"):
+            course_id = extract_course_id(link.attributes.get("href") or "")
+            if not course_id:
+                continue
+            courses[course_id] = MoodleCourse(
+                id=course_id, name=pick_course_name(_course_name_candidates(link)) or f"Course {course_id}"
+            )
+    return list(courses.values())
+
+
+def parse_course_modules(html: str, course_id: str) -> list[MoodleModule]:
+    tree = LexborHTMLParser(html)
+    modules: list[MoodleModule] = []
+    sections = [
+        (card, section) for card in tree.css(".grid-section.card") for section in card.css(".grid-section-inner")
+    ]
+    for idx, (card, section) in enumerate(sections):
+        href = section.attributes.get("href") or ""
+        title = normalize_text(_node_text(section.css_first(".card-body .card-header .text-truncate")))
+        if not title:
+            title = normalize_text(_node_text(section.css_first(".card-header")))
+        locked = section.css_first(".courseindex-locked") is not None
+        modules.append(
+            MoodleModule(
+                id=href.split("id=")[-1].split("&")[0],
+                course_id=course_id,
+                title=title or f"Module {idx + 1}",
+                visible=not locked,
+                blocked=locked,
+                block_reason="locked" if locked else None,
+                has_survey=False,
+                url=href or None,
+                activity_ids=_section_activity_ids(card),
+            )
+        )
+    if modules:
+        return modules
+
+    for idx, activity in enumerate(tree.css("li.activity-wrapper[data-id]")):
+        raw_title = _node_text(activity.css_first(".instancename")) or _node_text(
+            activity.css_first(".activityname")
+        )
+        link = activity.css_first("a[href*='mod/']") or activity.css_first("a[href]")
+        class_attr = activity.attributes.get("class") or ""
+        availability_text = _node_text(activity.css_first(".availabilityinfo")).strip()
+        modules.append(
+            MoodleModule(
+                id=activity.attributes.get("data-id") or f"activity-{idx + 1}",
+                course_id=course_id,
+                title=normalize_text(raw_title) or f"Activity {idx + 1}",
+                visible="dimmed" not in class_attr and "hidden" not in class_attr,
+                blocked=bool(availability_text),
+                block_reason=availability_text or None,
+                has_survey=is_survey_activity(class_attr, raw_title),
+                url=((link.attributes.get("href") or "") if link is not None else "") or None,
+            )
+        )
+    return modules
+
+
+def parse_grade_report(
+    html: str, course_id: str, item_type_filter: set[str] | None = None
+) -> Optional[list[dict]]:
+    tree = LexborHTMLParser(html)
+    if tree.css_first("table.user-grade") is None:
+        return None
+    entries: list[dict] = []
+    for idx, row in enumerate(tree.css("table.user-grade tbody tr")):
+        link = row.css_first("th.column-itemname a.gradeitemheader") or row.css_first(
+            "th.column-itemname a[href*='mod/']"
+        )
+        if link is None:
+            continue
+        item_type_label = _node_text(row.css_first("th.column-itemname .dimmed_text"))
+        if not normalize_text(item_type_label):
+            icon = row.css_first("th.column-itemname img[alt]")
+            item_type_label = (icon.attributes.get("alt") or "") if icon is not None else ""
+        grade_display = _node_text(row.css_first("td.column-grade div.d-flex > div:first-child"))
+        if not normalize_text(grade_display):
+            grade_display = _node_text(row.css_first("td.column-grade"))
+        entry = build_grade_entry(
+            course_id,
+            idx,
+            _node_text(link),
+            link.attributes.get("href") or "",
+            item_type_label,
+            grade_display,
+            item_type_filter=item_type_filter,
+        )
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def parse_module_surveys(html: str, module: MoodleModule, base_url: str) -> list[MoodleModuleSurvey]:
+    tree = LexborHTMLParser(html)
+    surveys: list[MoodleModuleSurvey] = []
+    for idx, activity in enumerate(tree.css("li.activity-wrapper")):
+        title = _node_text(activity.css_first(".instancename")) or _node_text(
+            activity.css_first(".activityname")
+        )
+        link = (
+            activity.css_first("a[href*='mod/feedback']")
+            or activity.css_first("a[href*='mod/survey']")
+            or activity.css_first("a[href]")
+        )
+        survey = build_module_survey(
+            module,
+            idx,
+            activity.attributes.get("class") or "",
+            title,
+            activity.attributes.get("data-id"),
+            (link.attributes.get("href") or "") if link is not None else "",
+            base_url,
+        )
+        if survey:
+            surveys.append(survey)
+    return surveys
+
+
+def parse_assignment_details(html: str) -> dict[str, str | None]:
+    tree = LexborHTMLParser(html)
+    details: dict[str, str | None] = {
+        "available_at": None,
+        "due_at": None,
+        "submission_status": None,
+        "grading_status": None,
+        "last_submission_at": None,
+    }
+    details["available_at"], details["due_at"] = parse_activity_dates(tree)
+    for row in tree.css(".submissionstatustable table tr"):
+        label = normalize_text(_node_text(row.css_first("th")))
+        apply_submission_status_row(details, label, _node_text(row.css_first("td")))
+    return details
+
+
+def parse_quiz_details(html: str) -> dict[str, str | int | None]:
+    tree = LexborHTMLParser(html)
+    details: dict[str, str | int | None] = {
+        "available_at": None,
+        "due_at": None,
+        "attempts_allowed": None,
+        "time_limit_minutes": None,
+    }
+    details["available_at"], details["due_at"] = parse_activity_dates(tree)
+    for node in tree.css(".quizinfo p"):
+        apply_quiz_info_line(details, _node_text(node))
+    return details
+
+
+def parse_activity_dates(tree: LexborHTMLParser) -> tuple[str | None, str | None]:
+    for selector in ACTIVITY_DATE_SELECTORS:
+        nodes = tree.css(selector)
+        if not nodes:
+            continue
+        available_at, due_at = parse_activity_date_lines([_node_text(node) for node in nodes])
+        if available_at or due_at:
+            return available_at, due_at
+    for selector in ACTIVITY_DATE_CONTAINERS:
+        container = tree.css_first(selector)
+        if container is None:
+            continue
+        lines = [_node_text(child) for child in container.iter()] or [_node_text(container)]
+        available_at, due_at = parse_activity_date_lines([line for line in lines if line.strip()])
+        if available_at or due_at:
+            return available_at, due_at
+    return None, None
+
+
+def _section_activity_ids(card: LexborNode) -> Optional[tuple[str, ...]]:
+    ids = [
+        node.attributes.get("data-id") or node.attributes.get("data-cmid") or ""
+        for node in card.css("[data-for='cmitem'][data-id], li.activity[data-id], [data-cmid]")
+    ]
+    return tuple(sorted({cm_id for cm_id in ids if cm_id})) or None
+
+
+def _course_name_candidates(link: LexborNode) -> list[str]:
+    candidates = [_node_text(link.css_first(selector)) for selector in (".multiline", ".text-truncate", ".coursename")]
+    return [candidate for candidate in candidates if candidate] + [_node_text(link)]
+
+
+def _node_text(node: Optional[LexborNode]) -> str:
+    if node is None:
+        return ""
+    return node.text(deep=True) or ""
@@ -9,7 +9,9 @@ from app.core.event_types import EventType
 import json
 
 from app.modules.moodle.adapters import get_adapter
+from app.modules.moodle.browser_pool import shutdown_browser_pool
 from app.modules.moodle.diff import diff_snapshots
+from app.modules.moodle.session_store import build_session_saver, load_session_state
 from app.modules.moodle.snapshot import get_last_snapshot, save_snapshot
 from app.modules.moodle.models import MoodleModule
 from app.models.moodle_course import MoodleCourse
@@ -196,10 +198,40 @@ async def async_run_quizzes_pipeline(db: Session, user_id: int) -> None:
         await adapter.close()
 
 
+async def async_run_daily_pipeline(db: Session, user_id: int) -> None:
+    # Modules, grades and quizzes on one adapter: its crawl plan and module
+    # cache span the whole run, and quizzes come out of the grade reports
+    # instead of a second pass over them.
+    logger = logging.getLogger("moodle")
+    adapter = await _build_adapter_from_vault(db, user_id)
+    await adapter.login()
+    try:
+        course_map = await _load_or_sync_courses(db, user_id, adapter)
+        course_ids = [course.external_id for course in course_map.values()]
+        modules = await _fetch_modules_by_ids(adapter, course_ids)
+        crud_moodle.upsert_modules(db, [module.__dict__ for module in modules], course_map)
+        logger.info("[Moodle] Modulos actualizados: %s", len(modules))
+
+        grade_items = await adapter.get_grades()
+        crud_moodle.upsert_grade_items(db, [item.__dict__ for item in grade_items], course_map)
+        quizzes = [item for item in grade_items if item.item_type == "quiz"]
+        logger.info("[Moodle] Calificaciones actualizadas: %s", len(grade_items))
+        logger.info("[Moodle] Cuestionarios actualizados: %s", len(quizzes))
+    finally:
+        await adapter.close()
+
+
 def run_pipeline(db: Session, user_id: int) -> None:
     if not logging.getLogger().handlers:
         logging.basicConfig(level=logging.INFO, format="%(message)s")
-    asyncio.run(async_run_pipeline(db, user_id))
+    asyncio.run(_run_pipeline_and_shutdown(db, user_id))
+
+
+async def _run_pipeline_and_shutdown(db: Session, user_id: int) -> None:
+    try:
+        await async_run_pipeline(db, user_id)
+    finally:
+        await shutdown_browser_pool()
 
 
 async def _load_or_sync_courses(db: Session, user_id: int, adapter) -> dict[str, MoodleCourse]:
@@ -224,20 +256,22 @@ async def _build_adapter_from_vault(db: Session, user_id: int):
     )
     creds_blob = decrypt_aes_gcm(pipeline_key, vault.credentials_nonce, vault.credentials_ciphertext)
     creds = json.loads(creds_blob.decode("utf-8"))
-    return get_adapter(creds)
+    return get_adapter(
+        creds,
+        storage_state=load_session_state(vault, pipeline_key),
+        session_saver=build_session_saver(db, user_id, pipeline_key),
+    )
 
 
 async def _fetch_modules(adapter, courses: list) -> list[MoodleModule]:
-    modules: list[MoodleModule] = []
-    for course in courses:
-        modules.extend(await adapter.get_modules(course.id))
-    return modules
+    return await _fetch_modules_by_ids(adapter, [course.id for course in courses])
 
 
 async def _fetch_modules_by_ids(adapter, course_ids: list[str]) -> list[MoodleModule]:
     modules: list[MoodleModule] = []
-    for course_id in course_ids:
-        modules.extend(await adapter.get_modules(course_id))
+    course_modules = await asyncio.gather(*(adapter.get_modules(course_id) for course_id in course_ids))
+    for entries in course_modules:
+        modules.extend(entries)
     return modules
 
 
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    def __init__(self, host: str, rate: float, burst: int) -> None:
+        self.host = host
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._delayed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waiting = 0
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+            self._updated_at = now
+            self._tokens -= 1
+            delay = 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+            self._requests += 1
+            if delay:
+                self._delayed += 1
+                self._wait_total += delay
+                self._wait_max = max(self._wait_max, delay)
+            return delay
+
+    async def acquire(self) -> float:
+        delay = self.reserve()
+        if delay:
+            self._waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._waiting -= 1
+        return delay
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "rate_per_second": self._rate,
+            "burst": self._burst,
+            "requests": self._requests,
+            "delayed": self._delayed,
+            "waiting": self._waiting,
+            "queue_ms_total": int(self._wait_total * 1000),
+            "queue_ms_max": int(self._wait_max * 1000),
+        }
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str) -> TokenBucket | None:
+    if settings.MOODLE_RATE_LIMIT_RPS <= 0:
+        return None
+    host = urlparse(url).hostname or url
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(host, settings.MOODLE_RATE_LIMIT_RPS, settings.MOODLE_RATE_LIMIT_BURST)
+            _buckets[host] = bucket
+    return bucket
+
+
+async def throttle(url: str) -> None:
+    bucket = get_rate_limiter(url)
+    if bucket is not None:
+        await bucket.acquire()
+
+
+def rate_limit_metrics() -> dict[str, Any]:
+    return {host: bucket.metrics() for host, bucket in _buckets.items()}
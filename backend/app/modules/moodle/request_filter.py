@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Request, Response, Route
+
+
+_ESTIMATED_BYTES = {
+    "image": 25_000,
+    "media": 250_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 60_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+}
+_SCRIPT_TYPES = frozenset({"script", "xhr", "fetch"})
+
+
+@dataclass(frozen=True)
+class RequestFilterProfile:
+    blocked_resource_types: frozenset[str]
+    block_third_party: bool
+    block_scripts: bool
+    script_allowlist: tuple[str, ...]
+
+    @classmethod
+    def from_settings(cls) -> Optional["RequestFilterProfile"]:
+        if not settings.MOODLE_BLOCK_RESOURCES:
+            return None
+        blocked = {"image", "media", "font"}
+        if settings.MOODLE_BLOCK_CSS:
+            blocked.add("stylesheet")
+        allowlist = tuple(
+            entry.strip() for entry in settings.MOODLE_SCRIPT_ALLOWLIST.split(",") if entry.strip()
+        )
+        return cls(
+            blocked_resource_types=frozenset(blocked),
+            block_third_party=True,
+            block_scripts=settings.MOODLE_BLOCK_SCRIPTS,
+            script_allowlist=allowlist,
+        )
+
+
+@dataclass
+class RequestFilterStats:
+    allowed: int = 0
+    blocked: dict[str, int] = field(default_factory=dict)
+    bytes_loaded: int = 0
+    bytes_saved_estimate: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "allowed": self.allowed,
+            "blocked": dict(self.blocked),
+            "blocked_total": sum(self.blocked.values()),
+            "bytes_loaded": self.bytes_loaded,
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+        }
+
+
+class RequestFilter:
+    def __init__(self, profile: RequestFilterProfile, base_url: str) -> None:
+        parsed = urlparse(base_url)
+        self._profile = profile
+        self._host = parsed.hostname or ""
+        self._base_path = parsed.path.rstrip("/")
+        self._observed: dict[str, tuple[int, int]] = {}
+        self._logger = logging.getLogger("moodle")
+        self.stats = RequestFilterStats()
+
+    async def install(self, context: BrowserContext) -> None:
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def report(self) -> None:
+        if not self.stats.allowed and not self.stats.blocked:
+            return
+        summary = self.stats.to_dict()
+        self._logger.info(
+            "[Moodle] Request filter: %s allowed, %s blocked %s, %s KB loaded, ~%s KB saved",
+            summary["allowed"],
+            summary["blocked_total"],
+            summary["blocked"],
+            summary["bytes_loaded"] // 1024,
+            summary["bytes_saved_estimate"] // 1024,
+        )
+
+    async def _handle(self, route: Route) -> None:
+        request = route.request
+        reason = self._block_reason(request)
+        if reason is None:
+            self.stats.allowed += 1
+            await route.fallback()
+            return
+        self.stats.blocked[reason] = self.stats.blocked.get(reason, 0) + 1
+        self.stats.bytes_saved_estimate += self._estimate_size(request.resource_type)
+        await route.abort("blockedbyclient")
+
+    def _block_reason(self, request: Request) -> str | None:
+        resource_type = request.resource_type
+        if resource_type == "document":
+            return None
+        host = urlparse(request.url).hostname or ""
+        if self._profile.block_third_party and host and host != self._host:
+            return "third_party"
+        if resource_type in self._profile.blocked_resource_types:
+            return resource_type
+        if self._profile.block_scripts and resource_type in _SCRIPT_TYPES:
+            if not self._page_allows_scripts(request):
+                return resource_type
+        return None
+
+    def _page_allows_scripts(self, request: Request) -> bool:
+        try:
+            page_url = request.frame.url
+        except Exception:
+            return True
+        path = urlparse(page_url).path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path) :]
+        return any(path.startswith(prefix) for prefix in self._profile.script_allowlist)
+
+    def _estimate_size(self, resource_type: str) -> int:
+        total, count = self._observed.get(resource_type, (0, 0))
+        if count:
+            return total // count
+        return _ESTIMATED_BYTES.get(resource_type, 10_000)
+
+    def _on_response(self, response: Response) -> None:
+        length = response.headers.get("content-length")
+        if not length or not length.isdigit():
+            return
+        size = int(length)
+        self.stats.bytes_loaded += size
+        resource_type = response.request.resource_type
+        total, count = self._observed.get(resource_type, (0, 0))
+        self._observed[resource_type] = (total + size, count + 1)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_PERMANENT_NET_ERRORS = ("net::ERR_ABORTED", "net::ERR_BLOCKED_BY_CLIENT", "net::ERR_INVALID_URL")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class TransientStatusError(RuntimeError):
+    def __init__(self, url: str, status: int) -> None:
+        super().__init__(f"HTTP {status} while loading {url}")
+        self.status = status
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int
+    base_delay: float
+    max_delay: float
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(
+            attempts=max(1, settings.MOODLE_RETRY_ATTEMPTS),
+            base_delay=settings.MOODLE_RETRY_BASE_DELAY,
+            max_delay=settings.MOODLE_RETRY_MAX_DELAY,
+        )
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.host = host
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_seconds = reset_seconds
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._times_opened = 0
+        self._rejections = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self._reset_seconds:
+            return "half_open"
+        return self._state
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probe_in_flight:
+            self._state = "half_open"
+            self._probe_in_flight = True
+            return
+        self._rejections += 1
+        raise CircuitOpenError(f"Circuit open for {self.host}; skipping request.")
+
+    def record_success(self) -> None:
+        self._state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self._failures += 1
+        if self._state == "half_open" or self._failures >= self._failure_threshold:
+            if self._state != "open":
+                self._times_opened += 1
+                logging.getLogger("moodle").warning(
+                    "[Moodle] Circuit opened for %s after %s failures", self.host, self._failures
+                )
+            self._state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_neutral(self) -> None:
+        self._probe_in_flight = False
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self._times_opened,
+            "rejections": self._rejections,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_counters: Counter[str] = Counter()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    host = urlparse(url).hostname or url
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            host,
+            failure_threshold=settings.MOODLE_BREAKER_FAILURE_THRESHOLD,
+            reset_seconds=settings.MOODLE_BREAKER_RESET_SECONDS,
+        )
+        _breakers[host] = breaker
+    return breaker
+
+
+def is_transient(exc: BaseException) -> bool:
+    from playwright.async_api import Error as PlaywrightError
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (TransientStatusError, PlaywrightTimeoutError, asyncio.TimeoutError, httpx.TimeoutException)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, PlaywrightError):
+        message = str(exc)
+        if any(code in message for code in _PERMANENT_NET_ERRORS):
+            return False
+        return "net::ERR_" in message or "NS_ERROR_" in message
+    return isinstance(exc, ConnectionError)
+
+
+async def call_with_retry(
+    operation: str,
+    url: str,
+    fn: Callable[[], Awaitable[T]],
+    policy: RetryPolicy | None = None,
+) -> T:
+    policy = policy or RetryPolicy.from_settings()
+    breaker = get_breaker(url)
+    logger = logging.getLogger("moodle")
+    for attempt in range(policy.attempts):
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            _counters[f"{operation}.rejected"] += 1
+            raise
+        _counters[f"{operation}.attempts"] += 1
+        try:
+            result = await fn()
+        except Exception as exc:
+            transient = is_transient(exc)
+            if transient:
+                breaker.record_failure()
+                _counters[f"{operation}.transient_failures"] += 1
+            else:
+                breaker.record_neutral()
+                _counters[f"{operation}.permanent_failures"] += 1
+            if not transient or attempt == policy.attempts - 1 or breaker.state == "open":
+                raise
+            delay = policy.delay(attempt)
+            _counters[f"{operation}.retries"] += 1
+            logger.warning(
+                "[Moodle] %s attempt %s failed (%s), retrying in %.1fs", operation, attempt + 1, exc, delay
+            )
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+    raise RuntimeError("Retry policy exhausted without result.")
+
+
+def retry_metrics() -> dict[str, Any]:
+    return {
+        "counters": dict(_counters),
+        "circuit_breakers": {host: breaker.metrics() for host, breaker in _breakers.items()},
+    }
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.moodle_vault import get_vault, update_session_state
+from app.models.moodle_vault import MoodleVault
+from app.services.vault_crypto import decrypt_aes_gcm, encrypt_aes_gcm
+
+
+def load_session_state(vault: MoodleVault, pipeline_key: bytes) -> Optional[dict]:
+    if not vault.session_state_ciphertext or not vault.session_state_nonce:
+        return None
+    try:
+        blob = decrypt_aes_gcm(pipeline_key, vault.session_state_nonce, vault.session_state_ciphertext)
+        return json.loads(blob.decode("utf-8"))
+    except Exception as exc:
+        logging.getLogger("moodle").warning("[Moodle] Stored session could not be decrypted: %s", exc)
+        return None
+
+
+def build_session_saver(db: Session, user_id: int, pipeline_key: bytes) -> Callable[[Optional[dict]], None]:
+    def save(state: Optional[dict]) -> None:
+        vault = get_vault(db, user_id)
+        if vault is None:
+            return
+        if not state:
+            update_session_state(db, vault, None, None)
+            return
+        blob = json.dumps(state, ensure_ascii=True).encode("utf-8")
+        nonce, ciphertext = encrypt_aes_gcm(pipeline_key, blob)
+        update_session_state(db, vault, ciphertext, nonce)
+
+    return save
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.modules.moodle.models import MoodleModule
+
+
+def section_entry_hash(module: MoodleModule) -> str:
+    payload = json.dumps(
+        [module.title, module.url, module.visible, module.blocked, module.block_reason, module.activity_ids]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SurveyIndex:
+    def __init__(self, path: str, ttl_seconds: int) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            " owner TEXT NOT NULL, course_id TEXT NOT NULL, module_id TEXT NOT NULL,"
+            " entry_hash TEXT NOT NULL, blocked INTEGER NOT NULL, survey_count INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " PRIMARY KEY (owner, course_id, module_id))"
+        )
+        self._db.commit()
+        self.stats: Counter[str] = Counter()
+
+    def needs_visit(self, owner: str, module: MoodleModule, entry_hash: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT entry_hash, blocked, survey_count, stored_at FROM sections"
+                " WHERE owner = ? AND course_id = ? AND module_id = ?",
+                (owner, module.course_id, module.id),
+            ).fetchone()
+        reason = self._revisit_reason(row, module, entry_hash)
+        if reason:
+            self.stats[f"revisit_{reason}"] += 1
+            return True
+        self.stats["skipped"] += 1
+        return False
+
+    def remember(self, owner: str, module: MoodleModule, entry_hash: str, survey_count: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sections"
+                " (owner, course_id, module_id, entry_hash, blocked, survey_count, stored_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    owner,
+                    module.course_id,
+                    module.id,
+                    entry_hash,
+                    int(module.blocked),
+                    survey_count,
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM sections").fetchone()
+        return {"sections": count, **self.stats}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _revisit_reason(self, row: Optional[tuple], module: MoodleModule, entry_hash: str) -> str:
+        if row is None:
+            return "unknown"
+        stored_hash, blocked, survey_count, stored_at = row
+        if bool(blocked) != module.blocked:
+            return "lock_flipped"
+        if stored_hash != entry_hash:
+            return "entry_changed"
+        # Without the section's activity list an unchanged entry says nothing
+        # about a survey added inside it.
+        if module.activity_ids is None:
+            return "contents_unknown"
+        # Listed surveys stay listed after completion, so any survey keeps the
+        # section live until it is gone from the page.
+        if survey_count:
+            return "pending_survey"
+        if time.time() - stored_at > self._ttl_seconds:
+            return "expired"
+        return ""
+
+
+_index: SurveyIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_survey_index() -> SurveyIndex | None:
+    global _index
+    if not settings.MOODLE_SURVEY_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SurveyIndex(
+                settings.MOODLE_SURVEY_INDEX_PATH, ttl_seconds=settings.MOODLE_SURVEY_INDEX_TTL_SECONDS
+            )
+    return _index
+
+
+def survey_index_metrics() -> dict[str, Any]:
+    if _index is None:
+        return {}
+    return _index.metrics()
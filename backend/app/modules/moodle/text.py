@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(value.split()).strip()
+
+
+def parse_grade_value(value: str) -> float | None:
+    if not value:
+        return None
+    cleaned = value.strip()
+    if cleaned == "-" or cleaned.lower() == "na":
+        return None
+    cleaned = cleaned.replace("%", "").strip()
+    cleaned = cleaned.replace(".", "").replace(",", ".")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def extract_activity_id_from_url(url: str) -> str | None:
+    if "id=" not in url:
+        return None
+    return url.split("id=")[-1].split("&")[0]
+
+
+def map_grade_item_type_from_url(url: str) -> str | None:
+    normalized = normalize_text(url).lower()
+    if "mod/assign" in normalized:
+        return "assignment"
+    if "mod/quiz" in normalized:
+        return "quiz"
+    return None
+
+
+def normalize_for_compare(value: str) -> str:
+    lowered = normalize_text(value).lower()
+    normalized = unicodedata.normalize("NFKD", lowered)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def split_after_label(value: str) -> str:
+    if ":" not in value:
+        return value
+    return value.split(":", 1)[1].strip()
+
+
+def format_datetime(value: datetime | None) -> str | None:
+    if not value:
+        return None
+    return value.isoformat()
+
+
+def parse_int_after_label(value: str) -> int | None:
+    if ":" in value:
+        value = value.split(":", 1)[1].strip()
+    match = re.search(r"(\d+)", value)
+    if not match:
+        return None
+    try:
+        return int(match.group(1))
+    except ValueError:
+        return None
+
+
+def parse_duration_minutes(value: str) -> int | None:
+    if ":" in value:
+        value = value.split(":", 1)[1].strip()
+    match = re.search(r"(\d+)", value)
+    if not match:
+        return None
+    amount = int(match.group(1))
+    normalized = normalize_for_compare(value)
+    if "hora" in normalized:
+        return amount * 60
+    return amount
+
+
+def extract_course_id(href: str) -> Optional[str]:
+    parsed = urlparse(href)
+    params = parse_qs(parsed.query)
+    course_ids = params.get("id")
+    if not course_ids:
+        return None
+    return course_ids[0]
+
+
+def normalize_text_optional(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return " ".join(value.split())
+
+
+def clean_course_name(value: Optional[str]) -> str:
+    text = normalize_text_optional(value)
+    if not text:
+        return ""
+    lowered = text.lower()
+    marker = "nombre del curso"
+    if lowered.startswith(marker):
+        text = normalize_text_optional(text[len(marker) :])
+    if not text:
+        return ""
+    best = ""
+    for match in re.finditer(r"\s+", text):
+        prefix = text[: match.start()].strip()
+        rest = text[match.end() :].strip()
+        if len(prefix) < 30 or len(rest) < 8:
+            continue
+        if rest.startswith(prefix) or prefix.startswith(rest):
+            if len(prefix) > len(best):
+                best = prefix
+    return best or text
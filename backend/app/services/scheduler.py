@@ -51,9 +51,7 @@ async def _run_daily_jobs() -> None:
             if not user:
                 continue
             try:
-                await moodle_pipeline.async_run_modules_pipeline(db, user.id)
-                await moodle_pipeline.async_run_grades_pipeline(db, user.id)
-                await moodle_pipeline.async_run_quizzes_pipeline(db, user.id)
+                await moodle_pipeline.async_run_daily_pipeline(db, user.id)
                 subject, text = build_pending_summary(db, user.id)
                 await send_mailersend_email(subject, text, to_email=user.email)
             except Exception as user_exc: